@@ -11,11 +11,23 @@ class Settings(BaseSettings):
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "dev-secret-key-change-in-production")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+    password_hash_queue_size: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    user_cache_ttl_seconds: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    # Build the current user from the JWT claims alone, without any database lookup
+    auth_trust_jwt_claims: bool = os.getenv("AUTH_TRUST_JWT_CLAIMS", "false").lower() == "true"
     
     # Cloudinary
     cloudinary_cloud_name: str = os.getenv("CLOUDINARY_CLOUD_NAME", "")
     cloudinary_api_key: str = os.getenv("CLOUDINARY_API_KEY", "")
     cloudinary_api_secret: str = os.getenv("CLOUDINARY_API_SECRET", "")
+    cloudinary_timeout_seconds: float = float(os.getenv("CLOUDINARY_TIMEOUT_SECONDS", "30"))
+    avatar_max_bytes: int = int(os.getenv("AVATAR_MAX_BYTES", str(10 * 1024 * 1024)))
+    avatar_max_pixels: int = int(os.getenv("AVATAR_MAX_PIXELS", "25000000"))
+    avatar_webp_quality: int = int(os.getenv("AVATAR_WEBP_QUALITY", "85"))
+    image_processing_workers: int = int(os.getenv("IMAGE_PROCESSING_WORKERS", "2"))
     
     # Google OAuth
     google_client_id: str = os.getenv("GOOGLE_CLIENT_ID", "")
@@ -26,6 +38,66 @@ class Settings(BaseSettings):
     frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
     environment: str = os.getenv("ENVIRONMENT", "development")
 
+    # Gemini requests
+    gemini_per_service_calls: bool = os.getenv("GEMINI_PER_SERVICE_CALLS", "false").lower() == "true"
+    gemini_max_concurrency: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "3"))
+    gemini_stream_responses: bool = os.getenv("GEMINI_STREAM_RESPONSES", "false").lower() == "true"
+    gemini_structured_output: bool = os.getenv("GEMINI_STRUCTURED_OUTPUT", "false").lower() == "true"
+    gemini_client_mode: str = os.getenv("GEMINI_CLIENT_MODE", "live")  # "live" or "fake" (offline)
+    gemini_context_cache: bool = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+    gemini_context_cache_ttl_seconds: int = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    gemini_context_cache_refresh_seconds: int = int(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH_SECONDS", "300"))
+    gemini_timeout_seconds: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+    gemini_max_connections: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+    gemini_max_keepalive_connections: int = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    gemini_keepalive_expiry_seconds: float = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+    # Gemini analysis cache
+    ai_cache_ttl_seconds: int = int(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+    ai_cache_memory_size: int = int(os.getenv("AI_CACHE_MEMORY_SIZE", "512"))
+    ai_cache_memory_ttl_seconds: int = int(os.getenv("AI_CACHE_MEMORY_TTL_SECONDS", "300"))
+
+    # Job queue / workers
+    embedded_workers: bool = os.getenv("EMBEDDED_WORKERS", "true").lower() == "true"
+    worker_concurrency: int = int(os.getenv("WORKER_CONCURRENCY", "4"))
+    worker_lease_seconds: int = int(os.getenv("WORKER_LEASE_SECONDS", "60"))
+    worker_poll_interval: float = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+    worker_max_attempts: int = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+    singleflight_enabled: bool = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+    singleflight_lease_seconds: int = int(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", "60"))
+    singleflight_result_seconds: int = int(os.getenv("SINGLEFLIGHT_RESULT_SECONDS", "120"))
+    singleflight_poll_interval: float = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "1.0"))
+    job_write_batch_delay: float = float(os.getenv("JOB_WRITE_BATCH_DELAY", "0.05"))
+    job_write_batch_size: int = int(os.getenv("JOB_WRITE_BATCH_SIZE", "100"))
+    batch_max_channels: int = int(os.getenv("BATCH_MAX_CHANNELS", "500"))
+    job_max_videos: int = int(os.getenv("JOB_MAX_VIDEOS", "10"))
+
+    # Job submission credits and rate limits (jobs per window, per user; guests per client IP)
+    credits_per_job: int = int(os.getenv("CREDITS_PER_JOB", "1"))
+    submit_rate_limit_window_seconds: float = float(os.getenv("SUBMIT_RATE_LIMIT_WINDOW_SECONDS", "60"))
+    submit_rate_limit_guest: int = int(os.getenv("SUBMIT_RATE_LIMIT_GUEST", "2"))
+    submit_rate_limit_free: int = int(os.getenv("SUBMIT_RATE_LIMIT_FREE", "5"))
+    submit_rate_limit_pro: int = int(os.getenv("SUBMIT_RATE_LIMIT_PRO", "30"))
+    submit_rate_limit_team: int = int(os.getenv("SUBMIT_RATE_LIMIT_TEAM", "600"))
+
+    # Job event streams
+    job_events_change_streams: bool = os.getenv("JOB_EVENTS_CHANGE_STREAMS", "true").lower() == "true"
+    job_events_keepalive_seconds: float = float(os.getenv("JOB_EVENTS_KEEPALIVE_SECONDS", "15"))
+
+    # YouTube quota; the request rate applies across all API and worker processes
+    youtube_daily_quota: int = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+    youtube_requests_per_second: float = float(os.getenv("YOUTUBE_REQUESTS_PER_SECOND", "10"))
+    youtube_request_burst: int = int(os.getenv("YOUTUBE_REQUEST_BURST", "20"))
+
+    # YouTube caches
+    channel_cache_size: int = int(os.getenv("CHANNEL_CACHE_SIZE", "4096"))
+    channel_cache_memory_ttl_seconds: int = int(os.getenv("CHANNEL_CACHE_MEMORY_TTL_SECONDS", "3600"))
+    channel_cache_ttl_seconds: int = int(os.getenv("CHANNEL_CACHE_TTL_SECONDS", "604800"))
+    response_cache_size: int = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+    response_cache_ttl_seconds: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+    playlist_freshness_seconds: int = int(os.getenv("PLAYLIST_FRESHNESS_SECONDS", "600"))
+    statistics_freshness_seconds: int = int(os.getenv("STATISTICS_FRESHNESS_SECONDS", "300"))
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
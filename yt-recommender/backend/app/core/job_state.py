@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.services.mongo_client import get_db, job_updates
+
+_MISSING = object()
+
+
+def _with_path(doc: Optional[Dict[str, Any]], parts: List[str], value: Any) -> Dict[str, Any]:
+    """Copy of doc with the dotted path parts set to value (dicts along the path are copied, not mutated)."""
+    doc = dict(doc) if isinstance(doc, dict) else {}
+    if len(parts) == 1:
+        doc[parts[0]] = value
+    else:
+        doc[parts[0]] = _with_path(doc.get(parts[0]), parts[1:], value)
+    return doc
+
+
+def merge_set(fields: Dict[str, Any], path: str, value: Any):
+    """
+    Add one path to a $set document, keeping its paths free of conflicts: a path
+    inside a pending value updates that value, a path above pending ones replaces them.
+    """
+    for existing in list(fields):
+        if existing == path or existing.startswith(path + "."):
+            del fields[existing]
+        elif path.startswith(existing + "."):
+            fields[existing] = _with_path(fields[existing], path[len(existing) + 1:].split("."), value)
+            return
+    fields[path] = value
+
+
+class JobWriteBatcher:
+    """
+    Coalesces job updates from concurrent jobs into bulk writes.
+
+    Updates are queued per job (several updates of the same job are merged into one
+    $set) and flushed after a short delay, or as soon as a full batch is waiting, with
+    a single unordered bulk_write. Batches are written one after the other so the
+    updates of a job are applied in the order they were made.
+    """
+
+    def __init__(self, max_batch: int = settings.job_write_batch_size, delay: float = settings.job_write_batch_delay):
+        self.max_batch = max_batch
+        self.delay = delay
+        self._pending: Dict[str, Tuple[Dict[str, Any], List[asyncio.Future]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._write_lock = asyncio.Lock()
+        self._inflight = set()
+
+    def submit(self, job_id: str, fields: Dict[str, Any]) -> asyncio.Future:
+        """Queue a $set for a job; the returned future resolves once it is written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending, futures = self._pending.setdefault(job_id, ({}, []))
+        for path, value in fields.items():
+            merge_set(pending, path, value)
+        futures.append(future)
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._write(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def drain(self):
+        """Write everything still queued and wait for the writes in flight."""
+        self._flush()
+        await asyncio.gather(*list(self._inflight), return_exceptions=True)
+
+    async def _write(self, batch: Dict[str, Tuple[Dict[str, Any], List[asyncio.Future]]]):
+        requests = [UpdateOne({"_id": ObjectId(job_id)}, {"$set": fields}) for job_id, (fields, _) in batch.items()]
+        try:
+            async with self._write_lock:
+                await get_db().jobs.bulk_write(requests, ordered=False)
+        except Exception as e:
+            for _, futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for job_id, (fields, futures) in batch.items():
+            job_updates.publish(job_id, fields)
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+
+# Shared job write batcher used by all jobs in this process
+job_writes = JobWriteBatcher()
+
+
+class JobState:
+    """
+    In-memory copy of a job document that is written back as compact $set diffs.
+
+    Stages change the state with set(); flush() writes only the paths that changed
+    since the last flush, through the shared job write batcher. Values equal to the
+    current state are not written again.
+    """
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job_id = job["_id"]
+        self._doc = dict(job)
+        self._dirty: Dict[str, Any] = {}
+
+    def get(self, path: str, default: Any = None) -> Any:
+        value: Any = self._doc
+        for part in path.split("."):
+            if not isinstance(value, dict) or part not in value:
+                return default
+            value = value[part]
+        return value
+
+    def set(self, path: str, value: Any):
+        """Change one (dotted) path of the job."""
+        if self.get(path, _MISSING) == value:
+            return
+        self._doc = _with_path(self._doc, path.split("."), value)
+        merge_set(self._dirty, path, value)
+
+    def update(self, fields: Dict[str, Any]):
+        for path, value in fields.items():
+            self.set(path, value)
+
+    async def flush(self, wait: bool = True):
+        """
+        Write the pending changes. With wait=False the write completes in the
+        background; if it fails, its changes are written again by the next flush.
+        """
+        if not self._dirty:
+            return
+        fields, self._dirty = self._dirty, {}
+        fields["updated_at"] = datetime.utcnow()
+        future = job_writes.submit(self.job_id, fields)
+        if wait:
+            await future
+        else:
+            future.add_done_callback(lambda f: self._write_failed(f, fields))
+
+    def _write_failed(self, future: asyncio.Future, fields: Dict[str, Any]):
+        if future.cancelled() or future.exception() is None:
+            return
+        print(f"Could not save progress of job {self.job_id}, retrying with the next update: {str(future.exception())}")
+        for path in fields:
+            # The current state already includes any newer change to these paths
+            merge_set(self._dirty, path, self.get(path))
@@ -0,0 +1,186 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.core.config import settings
+from app.services.mongo_client import get_db
+from app.services.youtube import normalize_channel_query
+from app.models.models import FLIGHT_COLLECTION
+
+
+class FlightFailedError(Exception):
+    """The job that did the work for a group of identical jobs failed."""
+
+
+class _LeaderCancelled(Exception):
+    """The in-process leader was cancelled before producing a result."""
+
+
+def flight_key(channel_name: str, services: Iterable[str]) -> str:
+    """Identical jobs: same normalized channel and same set of services."""
+    return f"{normalize_channel_query(channel_name)}|{','.join(sorted(set(services)))}"
+
+
+class SingleFlight:
+    """
+    Makes concurrent identical jobs share one execution.
+
+    The first job for a key becomes the leader and runs the work; jobs arriving
+    while it runs (or shortly after it succeeded) attach to its result instead.
+    A failure is only shared with the jobs already waiting; the next job runs again.
+    Within a process, followers wait on the leader's future. Across worker
+    processes, the leader holds a lease on a document in FLIGHT_COLLECTION and
+    stores the result there for followers to pick up. A leader that dies loses its
+    lease and the next follower takes over.
+    """
+
+    def __init__(
+        self,
+        lease_seconds: int = settings.singleflight_lease_seconds,
+        result_seconds: int = settings.singleflight_result_seconds,
+        poll_interval: float = settings.singleflight_poll_interval,
+    ):
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(
+        self,
+        key: str,
+        job_id: str,
+        work: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Run work() for key once across all concurrent callers.
+        Returns (result, ID of the job that produced it).
+        """
+        while key in self._inflight:
+            try:
+                return await asyncio.shield(self._inflight[key])
+            except _LeaderCancelled:
+                continue  # Take over from the cancelled leader
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            outcome = await self._run_shared(key, job_id, work)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else _LeaderCancelled())
+            future.exception()  # Mark as retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(outcome)
+            return outcome
+        finally:
+            del self._inflight[key]
+
+    async def _run_shared(self, key, job_id, work) -> Tuple[Dict[str, Any], str]:
+        """Lead or follow the flight for key across worker processes."""
+        collection = get_db()[FLIGHT_COLLECTION]
+        joining = True
+        while True:
+            try:
+                # Only a job arriving after a flight failed takes it over; jobs that were
+                # already waiting on it share its failure
+                leading, doc = await self._acquire(collection, key, job_id, take_over_failed=joining)
+            except PyMongoError as e:
+                print(f"Single-flight coordination unavailable, running job {job_id} alone: {str(e)}")
+                return await work(), job_id
+
+            if leading:
+                return await self._lead(collection, key, job_id, work), job_id
+            if doc and doc.get("status") == "done":
+                return doc["result"], doc["leader_job_id"]
+            if doc and doc.get("status") == "failed":
+                raise FlightFailedError(doc.get("error") or "Identical job failed")
+            joining = False
+            await asyncio.sleep(self.poll_interval)
+
+    async def _acquire(
+        self, collection, key: str, job_id: str, take_over_failed: bool = False
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Become the leader if no live flight exists (none yet, lease expired or
+        result expired, or failed when take_over_failed). Otherwise return the
+        current flight document.
+        """
+        now = datetime.utcnow()
+        takeover = [
+            {"lease_expires_at": {"$lt": now}},
+            {"expires_at": {"$lt": now}},
+        ]
+        if take_over_failed:
+            takeover.append({"status": "failed"})
+        try:
+            doc = await collection.find_one_and_update(
+                {"_id": key, "$or": takeover},
+                {
+                    "$set": {
+                        "leader_job_id": job_id,
+                        "status": "running",
+                        "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                        "expires_at": now + timedelta(seconds=self.lease_seconds + self.result_seconds),
+                        "started_at": now,
+                    },
+                    "$unset": {"result": "", "error": ""},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return True, doc
+        except DuplicateKeyError:
+            # A live flight exists: its document did not match the filter
+            return False, await collection.find_one({"_id": key})
+
+    async def _lead(self, collection, key: str, job_id: str, work) -> Dict[str, Any]:
+        heartbeat = asyncio.create_task(self._heartbeat(collection, key, job_id))
+        try:
+            result = await work()
+        except Exception as e:
+            heartbeat.cancel()
+            # Kept only long enough for the followers polling it to see the failure
+            await self._finish(collection, key, job_id, {
+                "status": "failed",
+                "error": str(e),
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.poll_interval * 3),
+            })
+            raise
+        except BaseException:
+            # Cancelled (lease lost, shutdown): let a follower take over right away
+            heartbeat.cancel()
+            await self._finish(collection, key, job_id, {"lease_expires_at": datetime.utcnow()})
+            raise
+        heartbeat.cancel()
+        await self._finish(collection, key, job_id, {"status": "done", "result": result})
+        return result
+
+    async def _finish(self, collection, key: str, job_id: str, fields: Dict[str, Any]):
+        now = datetime.utcnow()
+        update = {"lease_expires_at": None, "expires_at": now + timedelta(seconds=self.result_seconds), **fields}
+        try:
+            await collection.update_one({"_id": key, "leader_job_id": job_id}, {"$set": update})
+        except PyMongoError as e:
+            print(f"Could not record single-flight outcome of job {job_id}: {str(e)}")
+
+    async def _heartbeat(self, collection, key: str, job_id: str):
+        """Extend the flight lease while the leader works."""
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            now = datetime.utcnow()
+            try:
+                await collection.update_one(
+                    {"_id": key, "leader_job_id": job_id, "status": "running"},
+                    {"$set": {
+                        "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                        "expires_at": now + timedelta(seconds=self.lease_seconds + self.result_seconds),
+                    }},
+                )
+            except PyMongoError:
+                pass  # Transient error, try again on the next beat
+
+
+# Global coordinator for identical jobs
+job_flights = SingleFlight()
@@ -1,44 +1,282 @@
 import asyncio
-from app.services.youtube import resolve_channel, fetch_latest_videos
-from app.services.ai import analyse
-from app.services.mongo_client import create_job, get_job, update_job
+import os
+import socket
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+from app.core.config import settings
+from app.services.youtube import resolve_channel, stream_channel_videos, prefetch_channels, close_http_client
+from app.services.ai import analyse, close_genai_client, PROMPT_VIDEO_COUNT
+from app.services.mongo_client import (
+    get_job,
+    update_job,
+    get_batch_channel_names,
+    refund_job_credits,
+    claim_next_job,
+    renew_job_lease,
+    release_job_lease,
+    close_client,
+)
+from app.db.indexes import ensure_indexes
+from app.db.migrations import run_migrations
+from app.core.singleflight import job_flights, flight_key
+from app.core.job_state import JobState, job_writes
+from app.utils.cache import TTLCache
 from uuid import uuid4
 
-async def process_job(job_id: str):
+# Channel prefetch of each batch seen by this process (batch ID -> task), run once per batch
+_batch_prefetches = TTLCache(maxsize=256, ttl=3600)
+
+async def process_job(job_id: str, job: Optional[Dict[str, Any]] = None):
     """Orchestrates the workflow for a given job.
-    Updates the MongoDB document after each step.
+    Keeps the job state in memory and writes what changed at the end of each step.
+    Identical jobs running at the same time (same channel and services) share the
+    work of one of them through the single-flight coordinator.
     """
-    # Step 1: Resolve channel
-    job = await get_job(job_id)
+    job = job or await get_job(job_id)
     if not job:
         return
+    state = JobState(job)
+    services = job.get("services", [])
+    if job.get("batch_id"):
+        await prefetch_batch(job["batch_id"])
+
+    async def run_pipeline() -> Dict[str, Any]:
+        return await _run_pipeline(state, job["channel_name"], services)
+
     try:
-        channel_id = await resolve_channel(job["channel_name"])
-        await update_job(job_id, {
-            "channel_id": channel_id,
-            "status": "channel_resolved",
-            "updated_at": asyncio.get_event_loop().time(),
-        })
+        if settings.singleflight_enabled:
+            key = flight_key(job["channel_name"], services)
+            result, leader_job_id = await job_flights.run(key, job_id, run_pipeline)
+        else:
+            result, leader_job_id = await run_pipeline(), job_id
     except Exception as e:
-        await update_job(job_id, {"status": "failed", "error": str(e)})
+        state.update({"status": "failed", "error": str(e)})
+        await state.flush()
+        await _refund(job_id)
         return
 
-    # Step 2: Fetch videos
+    if leader_job_id != job_id:
+        # Attached to an identical job: copy its outcome
+        state.update({
+            "channel_id": result["channel_id"],
+            "videos": result["videos"],
+            "ai_report": result["ai_report"],
+            "shared_from": leader_job_id,
+            "status": "completed",
+        })
+        await state.flush()
+
+
+async def _refund(job_id: str):
+    """Give the credits of a failed job back to its user."""
     try:
-        videos = await fetch_latest_videos(channel_id)
-        await update_job(job_id, {"videos": videos, "status": "videos_fetched"})
+        await refund_job_credits(job_id)
     except Exception as e:
-        await update_job(job_id, {"status": "failed", "error": str(e)})
-        return
+        print(f"Could not refund credits of job {job_id}: {str(e)}")
+
+
+async def prefetch_batch(batch_id: str):
+    """
+    Warm the channel caches for every channel of a batch, once per process.
+    Jobs of the same batch running at the same time wait for the same prefetch.
+    """
+    task = _batch_prefetches.get(batch_id)
+    if task is None:
+        async def prefetch():
+            try:
+                await prefetch_channels(await get_batch_channel_names(batch_id))
+            except Exception as e:
+                print(f"Could not prefetch channels of batch {batch_id}: {str(e)}")
+        task = asyncio.create_task(prefetch())
+        _batch_prefetches.set(batch_id, task)
+    await asyncio.shield(task)
+
+
+async def _run_pipeline(state: JobState, channel_name: str, services: List[str]) -> Dict[str, Any]:
+    """
+    Resolve the channel, fetch its videos and analyse them, recording progress on
+    the job after each step. Raises on failure.
+    Returns the outcome shared with identical jobs.
+
+    Progress writes are not waited for (the write batcher merges them with the next
+    ones when steps finish quickly); only the final result is.
+    """
+    # Step 1: Resolve channel
+    channel_id = await resolve_channel(channel_name)
+    state.update({"channel_id": channel_id, "status": "channel_resolved"})
+    await state.flush(wait=False)
+
+    # Steps 2 and 3: fetch videos page by page; the AI analysis starts as soon as the
+    # videos it reads have arrived, while the rest are still being fetched
+    state.set("ai_report", {"services": {}})
+
+    async def publish_service_result(service_name: str, result: Dict[str, Any]):
+        state.set(f"ai_report.services.{service_name}", result)
+        await state.flush(wait=False)
 
-    # Step 3: AI analysis
+    def start_analysis(prompt_videos: List[Dict[str, Any]]) -> asyncio.Task:
+        return asyncio.create_task(
+            analyse(prompt_videos, services=services, on_service_result=publish_service_result)
+        )
+
+    videos: List[Dict[str, Any]] = []
+    analysis: Optional[asyncio.Task] = None
     try:
-        # Fetch updated job to get services
-        job = await get_job(job_id)
-        services = job.get("services", [])
-        
-        report = await analyse(videos, services=services)
-        await update_job(job_id, {"ai_report": report, "status": "completed"})
-    except Exception as e:
-        await update_job(job_id, {"status": "failed", "error": str(e)})
-        return
+        async for video in stream_channel_videos(channel_id, max_videos=settings.job_max_videos, description_chars=None):
+            videos.append(video)
+            if analysis is None and len(videos) == PROMPT_VIDEO_COUNT:
+                analysis = start_analysis(list(videos))
+    except BaseException:
+        if analysis is not None:
+            analysis.cancel()
+        raise
+    state.update({"videos": videos, "status": "videos_fetched"})
+    await state.flush(wait=False)
+
+    report = await (analysis or start_analysis(videos))
+    if set(report) == {"services"} and isinstance(state.get("ai_report.services"), dict):
+        # Per service, so results already published are not written again
+        for service_name, result in report["services"].items():
+            state.set(f"ai_report.services.{service_name}", result)
+    else:
+        state.set("ai_report", report)
+    state.set("status", "completed")
+    await state.flush()
+    return {"channel_id": channel_id, "videos": videos, "ai_report": report}
+
+
+class JobWorkerPool:
+    """
+    Pulls jobs from the MongoDB-backed queue and runs them with bounded concurrency.
+
+    Each claimed job is protected by a lease that is renewed by a heartbeat while
+    the job runs. If the worker dies, the lease expires and another worker claims
+    the job again.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.worker_concurrency,
+        lease_seconds: int = settings.worker_lease_seconds,
+        poll_interval: float = settings.worker_poll_interval,
+        max_attempts: int = settings.worker_max_attempts,
+    ):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        """Start polling the queue in the background."""
+        if self._loop_task is None:
+            self._stopping.clear()
+            self._loop_task = asyncio.create_task(self._run())
+            print(f"Job worker {self.worker_id} started (concurrency={self.concurrency})")
+
+    async def stop(self):
+        """
+        Stop claiming new jobs and cancel the ones in flight.
+        Cancelled jobs have their lease released so another worker retries them.
+        Progress writes still queued are written before returning.
+        """
+        self._stopping.set()
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await job_writes.drain()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            try:
+                job = await claim_next_job(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"Job worker failed to claim a job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._slots.release()
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            task = asyncio.create_task(self._execute(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: Dict[str, Any]):
+        job_id = job["_id"]
+        try:
+            if job.get("attempts", 1) > self.max_attempts:
+                await update_job(job_id, {
+                    "status": "failed",
+                    "error": f"Job abandoned after {self.max_attempts} attempts",
+                    "updated_at": datetime.utcnow(),
+                })
+                await _refund(job_id)
+                return
+
+            work = asyncio.create_task(process_job(job_id, job))
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, work))
+            try:
+                await work
+            except asyncio.CancelledError:
+                if not work.cancelled():
+                    raise
+                print(f"Job {job_id} lost its lease, stopped processing")
+            finally:
+                heartbeat.cancel()
+        except Exception as e:
+            print(f"Job {job_id} crashed in worker: {str(e)}")
+        finally:
+            try:
+                await release_job_lease(job_id, self.worker_id)
+            except Exception:
+                pass  # The lease will simply expire
+            self._slots.release()
+
+    async def _heartbeat(self, job_id: str, work: asyncio.Task):
+        """Renew the job lease until the work finishes; abort the work if the lease is lost."""
+        interval = max(self.lease_seconds / 3, 1)
+        while not work.done():
+            await asyncio.sleep(interval)
+            try:
+                owned = await renew_job_lease(job_id, self.worker_id, self.lease_seconds)
+            except Exception:
+                continue  # Transient error, try again on the next beat
+            if not owned:
+                work.cancel()
+                return
+
+
+# Global worker pool instance
+worker_pool = JobWorkerPool()
+
+
+async def run_worker():
+    """Run a standalone worker process until interrupted."""
+    await ensure_indexes()
+    await run_migrations()
+    await worker_pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker_pool.stop()
+        await close_http_client()
+        await close_genai_client()
+        await close_client()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,159 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from app.core.config import settings
+from app.services.mongo_client import get_db, TERMINAL_JOB_STATUSES
+from app.models.models import (
+    USER_COLLECTION,
+    JOB_COLLECTION,
+    CHANNEL_CACHE_COLLECTION,
+    RESPONSE_CACHE_COLLECTION,
+    AI_CACHE_COLLECTION,
+    FLIGHT_COLLECTION,
+    RATE_LIMIT_COLLECTION,
+)
+
+# MongoDB error codes for an existing index with the same name/keys but other options
+_INDEX_OPTIONS_CONFLICT = (85, 86)
+
+# Every index the application relies on, per collection (default index names, so
+# indexes created by earlier versions are recognised as the same index)
+INDEXES: Dict[str, List[IndexModel]] = {
+    USER_COLLECTION: [
+        # Login, registration checks and OAuth lookups
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    JOB_COLLECTION: [
+        # A user's jobs, newest first (job history keyset pagination)
+        IndexModel([("email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # Jobs in a given state by age (monitoring, stale job sweeps)
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)]),
+        # Worker queue: claim_next_job() and pending quota
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING), ("created_at", ASCENDING)]),
+        # Progress and channels of a bulk submission
+        IndexModel([("batch_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    # Cache collections expire through TTL indexes
+    CHANNEL_CACHE_COLLECTION: [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    RESPONSE_CACHE_COLLECTION: [
+        IndexModel([("fetched_at", ASCENDING)], expireAfterSeconds=settings.response_cache_ttl_seconds),
+    ],
+    AI_CACHE_COLLECTION: [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # Single-flight documents of identical jobs
+    FLIGHT_COLLECTION: [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # Shared rate limit counters, one per key and window
+    RATE_LIMIT_COLLECTION: [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes(db=None):
+    """
+    Startup migration: create every index in INDEXES (a no-op for existing ones).
+
+    A TTL index whose expiry changed in the settings is updated in place with collMod.
+    Other failures, such as duplicate emails preventing a unique index, are reported
+    without stopping the application.
+    """
+    db = db if db is not None else get_db()
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for index in indexes:
+            spec = index.document
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code in _INDEX_OPTIONS_CONFLICT and "expireAfterSeconds" in spec:
+                    await _update_ttl(db, collection_name, spec)
+                else:
+                    print(f"Could not create index {spec['name']} on {collection_name}: {str(e)}")
+
+
+async def _update_ttl(db, collection_name: str, spec: Dict[str, Any]):
+    """Change the expiry of an existing TTL index on the same key."""
+    key_pattern = dict(spec["key"])
+    try:
+        await db.command(
+            "collMod",
+            collection_name,
+            index={"keyPattern": key_pattern, "expireAfterSeconds": spec["expireAfterSeconds"]},
+        )
+        print(f"Updated TTL of {collection_name} {key_pattern} to {spec['expireAfterSeconds']}s")
+    except OperationFailure as e:
+        print(f"Could not update TTL index on {collection_name}: {str(e)}")
+
+
+def hot_queries() -> List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]]]]:
+    """
+    The queries issued on every request or by every worker, as
+    (description, collection, filter, sort). Each must be served by an index.
+    """
+    now = datetime.utcnow()
+    return [
+        ("user by email", USER_COLLECTION, {"email": "someone@example.com"}, None),
+        ("user by username", USER_COLLECTION, {"username": "someone"}, None),
+        ("jobs of a user", JOB_COLLECTION, {"email": "someone@example.com"}, [("created_at", -1), ("_id", -1)]),
+        (
+            "jobs of a user, next page",
+            JOB_COLLECTION,
+            {
+                "email": "someone@example.com",
+                "$or": [
+                    {"created_at": {"$lt": now}},
+                    {"created_at": now, "_id": {"$lt": ObjectId()}},
+                ],
+            },
+            [("created_at", -1), ("_id", -1)],
+        ),
+        (
+            "claim next job",
+            JOB_COLLECTION,
+            {
+                "status": {"$nin": list(TERMINAL_JOB_STATUSES)},
+                "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}],
+            },
+            [("created_at", 1)],
+        ),
+        ("pending jobs", JOB_COLLECTION, {"status": "queued", "lease_owner": None}, None),
+        ("jobs of a batch", JOB_COLLECTION, {"batch_id": "0123456789abcdef"}, None),
+        ("stale jobs", JOB_COLLECTION, {"status": "failed", "updated_at": {"$lt": now}}, None),
+    ]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """All stage names of an explain() plan tree."""
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def verify_query_plans(db=None) -> List[str]:
+    """
+    Run explain() on every hot query and return the ones whose winning plan
+    contains a collection scan (an empty list means every query uses an index).
+    """
+    db = db if db is not None else get_db()
+    collection_scans = []
+    for description, collection_name, query, sort in hot_queries():
+        command = {"find": collection_name, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            collection_scans.append(f"{description} ({collection_name} {query})")
+    return collection_scans
@@ -0,0 +1,37 @@
+import asyncio
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services import ai_cache
+from app.services.ai import SERVICE_MAP
+from app.services.mongo_client import close_client
+
+
+async def invalidate_ai_cache(service: str) -> bool:
+    """
+    Drops the cached AI results of one service, e.g. after changing its prompt.
+    Accepts a service ID or name:
+
+        python -m app.db.invalidate_ai_cache predictive_ctr_analysis
+
+    Running API and worker processes keep their in-memory copies for at most
+    AI_CACHE_MEMORY_TTL_SECONDS.
+    """
+    name = SERVICE_MAP.get(service, service)
+    if name not in SERVICE_MAP.values():
+        print(f"Unknown service '{service}'. Known: {', '.join(SERVICE_MAP.values())}")
+        return False
+    try:
+        removed = await ai_cache.invalidate_service(name)
+        print(f"Removed {removed} cached results of {name}.")
+        return True
+    finally:
+        await close_client()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m app.db.invalidate_ai_cache <service ID or name>")
+        sys.exit(2)
+    sys.exit(0 if asyncio.run(invalidate_ai_cache(sys.argv[1])) else 1)
@@ -0,0 +1,63 @@
+from typing import Any, Dict
+from pymongo import UpdateOne
+from app.services.mongo_client import get_db
+from app.models.models import USER_COLLECTION, JOB_COLLECTION
+
+# Documents updated per bulk_write when backfilling
+_BACKFILL_BATCH = 1000
+
+
+async def drop_embedded_job_ids(db=None) -> int:
+    """
+    Remove the users.job_ids array left by earlier versions, which pushed every job
+    ID onto it. Job history is now read from the jobs collection (GET /jobs), so user
+    documents stay a fixed small size. Idempotent.
+    Returns the number of users changed.
+    """
+    db = db if db is not None else get_db()
+    result = await db[USER_COLLECTION].update_many(
+        {"job_ids": {"$exists": True}},
+        {"$unset": {"job_ids": ""}},
+    )
+    if result.modified_count:
+        print(f"Removed embedded job_ids from {result.modified_count} users")
+    return result.modified_count
+
+
+async def backfill_job_created_at(db=None) -> int:
+    """
+    Set created_at on jobs created by earlier versions, which stored None, from the
+    creation time of their ObjectId. Job history is paginated on created_at, so such
+    jobs would otherwise never appear after the first page. Idempotent.
+    Returns the number of jobs changed.
+    """
+    db = db if db is not None else get_db()
+    jobs = db[JOB_COLLECTION]
+    changed = 0
+    requests = []
+    async for job in jobs.find({"created_at": None}, {"_id": 1}):
+        created_at = job["_id"].generation_time.replace(tzinfo=None)
+        requests.append(UpdateOne({"_id": job["_id"], "created_at": None}, {"$set": {"created_at": created_at}}))
+        if len(requests) >= _BACKFILL_BATCH:
+            changed += (await jobs.bulk_write(requests, ordered=False)).modified_count
+            requests = []
+    if requests:
+        changed += (await jobs.bulk_write(requests, ordered=False)).modified_count
+    if changed:
+        print(f"Backfilled created_at on {changed} jobs")
+    return changed
+
+
+async def run_migrations(db=None) -> Dict[str, Any]:
+    """
+    Startup data migrations, run after ensure_indexes(). Each one is idempotent.
+    Failures are reported without stopping the application.
+    """
+    results: Dict[str, Any] = {}
+    for migration in (drop_embedded_job_ids, backfill_job_created_at):
+        try:
+            results[migration.__name__] = await migration(db)
+        except Exception as e:
+            print(f"Migration {migration.__name__} failed: {str(e)}")
+            results[migration.__name__] = None
+    return results
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db.indexes import ensure_indexes, verify_query_plans
+
+async def test_indexes():
+    """
+    Applies the index migration to a scratch database and fails if any hot query
+    is planned as a collection scan. Needs a real mongod (mongomock has no explain):
+
+        MONGODB_URI=mongodb://localhost:27017 python -m app.db.test_indexes
+    """
+    uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+    db_name = "yt_recommender_index_check"
+    print(f"Connecting to: {uri}")
+    client = AsyncIOMotorClient(uri)
+    try:
+        db = client[db_name]
+        await ensure_indexes(db)
+        print("Indexes created.")
+
+        for name in await db.list_collection_names():
+            indexes = await db[name].index_information()
+            print(f"{name}: {', '.join(indexes)}")
+
+        collection_scans = await verify_query_plans(db)
+        if collection_scans:
+            print("COLLSCAN in hot queries:")
+            for query in collection_scans:
+                print(f"  - {query}")
+            return False
+
+        print("Every hot query uses an index.")
+        return True
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(test_indexes()) else 1)
@@ -2,6 +2,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from app.routes import job, auth, test_db
+from app.core.config import settings
+from app.core.worker import worker_pool
+from app.db.indexes import ensure_indexes
+from app.db.migrations import run_migrations
+from app.services.youtube import close_http_client
+from app.services import cloudinary_service
+from app.services.ai import close_genai_client
+from app.services.mongo_client import close_client
+from app.utils.auth import close_password_executor
+from app.utils.images import close_image_executor
 
 app = FastAPI(title="YT Recommender Backend")
 
@@ -21,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],  # Read by the frontend on 429 and 503 responses
 )
 
 # Include routers
@@ -29,4 +40,22 @@ app.include_router(job.router)
 app.include_router(test_db.router, prefix="/api")
 
 
-# Optional startup/shutdown events can be added here
+@app.on_event("startup")
+async def startup():
+    await ensure_indexes()
+    await run_migrations()
+    # API replicas only enqueue jobs; run the pool in-process only when configured to
+    if settings.embedded_workers:
+        await worker_pool.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if settings.embedded_workers:
+        await worker_pool.stop()
+    await close_http_client()
+    await cloudinary_service.close_http_client()
+    await close_genai_client()
+    await close_client()
+    close_password_executor()
+    close_image_executor()
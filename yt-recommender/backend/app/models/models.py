@@ -5,19 +5,36 @@ from datetime import datetime
 # Collection names
 USER_COLLECTION = "users"
 JOB_COLLECTION = "jobs"
+CHANNEL_CACHE_COLLECTION = "channel_cache"
+UPLOADS_PLAYLIST_COLLECTION = "uploads_playlists"
+RESPONSE_CACHE_COLLECTION = "youtube_response_cache"
+QUOTA_LEDGER_COLLECTION = "quota_ledger"
+AI_CACHE_COLLECTION = "ai_report_cache"
+FLIGHT_COLLECTION = "job_flights"
+RATE_LIMIT_COLLECTION = "rate_limits"
 
 
 
 class JobDocument(BaseModel):
     job_id: str = Field(..., alias="_id")
     email: str
+    user_id: Optional[str] = None  # Submitting user; None for guest jobs from /submit
     channel_name: Optional[str] = None
     channel_id: Optional[str] = None
     services: List[str] = []
+    batch_id: Optional[str] = None  # Set on jobs submitted together through /submit/batch
     status: str = "queued"
     error: Optional[str] = None
     videos: Optional[List[Dict[str, Any]]] = None
     ai_report: Optional[str] = None
+
+    # Queue bookkeeping
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    quota_estimate: Optional[int] = None  # Projected YouTube quota units, for admission control
+    credits_reserved: int = 0  # Credits charged at submit time, refunded if the job fails
+
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -51,8 +68,6 @@ class UserDocument(BaseModel):
     credits_used: int = 0
     credits_limit: int = 100
 
-    job_ids: List[str] = []
-
     is_active: bool = True
     is_verified: bool = False
 
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, BackgroundTasks
 from fastapi.responses import RedirectResponse
 from datetime import datetime
 from typing import Optional
 from authlib.integrations.starlette_client import OAuth
+from pymongo.errors import DuplicateKeyError
 from starlette.requests import Request
 
 from app.schemas.schemas import UserRegister, UserLogin, TokenResponse, UserResponse, ProfileUpdate, PlanUpdate
-from app.utils.auth import hash_password, verify_password, create_jwt, get_current_user
+from app.utils.auth import (
+    hash_password_async,
+    verify_password_async,
+    create_jwt,
+    get_current_user,
+    get_current_user_profile,
+)
 from app.services import mongo_client
-from app.services.cloudinary_service import upload_avatar, delete_avatar
+from app.services.cloudinary_service import (
+    upload_avatar,
+    delete_avatar_quietly,
+    read_upload,
+    AvatarTooLargeError,
+)
+from app.utils.images import prepare_avatar_async, InvalidImageError, AVATAR_CONTENT_TYPE
 from app.core.config import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -50,7 +63,7 @@ async def register(user_data: UserRegister):
         "email": user_data.email,
         "username": user_data.username,
         "full_name": user_data.full_name,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password_async(user_data.password),
         "avatar_url": None,
         "avatar_public_id": None,
         "oauth_provider": None,
@@ -60,15 +73,20 @@ async def register(user_data: UserRegister):
         "plan": "free",
         "credits_used": 0,
         "credits_limit": 100,
-        "job_ids": [],
         "is_active": True,
         "is_verified": False,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
     
-    # Insert user
-    user_id = await mongo_client.create_user(user_doc)
+    # Insert user; the unique indexes catch a concurrent registration with the same email/username
+    try:
+        user_id = await mongo_client.create_user(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email or username already registered"
+        )
     
     # Create JWT token
     token = create_jwt(user_id, user_data.email)
@@ -110,7 +128,7 @@ async def login(credentials: UserLogin):
         )
     
     # Verify password
-    if not verify_password(credentials.password, user["password_hash"]):
+    if not await verify_password_async(credentials.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -136,7 +154,7 @@ async def login(credentials: UserLogin):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(user: dict = Depends(get_current_user)):
+async def get_me(user: dict = Depends(get_current_user_profile)):
     """
     Get current authenticated user profile
     """
@@ -204,6 +222,7 @@ async def update_profile(
 
 @router.post("/upload-avatar", response_model=UserResponse)
 async def upload_user_avatar(
+    background_tasks: BackgroundTasks,
     avatar: UploadFile = File(...),
     user: dict = Depends(get_current_user)
 ):
@@ -218,22 +237,26 @@ async def upload_user_avatar(
             detail="File must be an image"
         )
     
-    # Read file content
-    file_content = await avatar.read()
-    
     # Get current user to check for existing avatar
     user = await mongo_client.get_user_by_id(user_id)
+    old_public_id = user.get("avatar_public_id")
     
-    # Delete old avatar if exists
-    if user.get("avatar_public_id"):
-        try:
-            await delete_avatar(user["avatar_public_id"])
-        except Exception:
-            pass  # Continue even if deletion fails
-    
-    # Upload to Cloudinary
     try:
-        result = await upload_avatar(file_content, user_id)
+        # Read within the size limit, then crop, resize and re-encode locally (off the
+        # event loop) so only a small 400x400 WebP is sent to Cloudinary
+        original = b"".join([chunk async for chunk in read_upload(avatar, settings.avatar_max_bytes)])
+        prepared = await prepare_avatar_async(original)
+        result = await upload_avatar(
+            prepared,
+            user_id,
+            content_type=AVATAR_CONTENT_TYPE,
+            transformation=None,
+        )
+        
+        # The new avatar overwrites one stored under the same public ID; only
+        # an avatar stored under another ID has to be deleted, after responding
+        if old_public_id and old_public_id != result["public_id"]:
+            background_tasks.add_task(delete_avatar_quietly, old_public_id)
         
         # Update user document
         update_data = {
@@ -258,6 +281,16 @@ async def upload_user_avatar(
             credits_limit=user.get("credits_limit", 100),
             is_verified=user.get("is_verified", False)
         )
+    except AvatarTooLargeError as e:
+        raise HTTPException(
+            status_code=413,
+            detail=str(e)
+        )
+    except InvalidImageError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -266,17 +299,18 @@ async def upload_user_avatar(
 
 
 @router.delete("/avatar", response_model=UserResponse)
-async def delete_user_avatar(user: dict = Depends(get_current_user)):
+async def delete_user_avatar(
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(get_current_user_profile)
+):
     """
     Remove user profile picture
     """
     user_id = user["_id"]
     
+    # Cloudinary cleanup runs after the response
     if user.get("avatar_public_id"):
-        try:
-            await delete_avatar(user["avatar_public_id"])
-        except Exception:
-            pass  # Continue even if deletion fails
+        background_tasks.add_task(delete_avatar_quietly, user["avatar_public_id"])
     
     # Update user document
     update_data = {
@@ -361,18 +395,18 @@ async def update_plan(
 
 
 @router.delete("/account", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_account(user: dict = Depends(get_current_user)):
+async def delete_account(
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(get_current_user_profile)
+):
     """
     Delete user account permanently
     """
     user_id = user["_id"]
     
-    # Delete avatar from Cloudinary if exists
+    # Delete avatar from Cloudinary (after the response) if exists
     if user.get("avatar_public_id"):
-        try:
-            await delete_avatar(user["avatar_public_id"])
-        except Exception:
-            pass
+        background_tasks.add_task(delete_avatar_quietly, user["avatar_public_id"])
     
     # Delete user from database
     success = await mongo_client.delete_user(user_id)
@@ -447,7 +481,6 @@ async def google_callback(request: Request):
                 "plan": "free",
                 "credits_used": 0,
                 "credits_limit": 100,
-                "job_ids": [],
                 "is_active": True,
                 "is_verified": True,  # Google users are auto-verified
                 "created_at": datetime.utcnow(),
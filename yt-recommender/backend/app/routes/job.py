@@ -1,53 +1,435 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+import json
+import base64
+from fastapi import APIRouter, HTTPException, Request, Query, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
 from uuid import uuid4
-from app.schemas.schemas import SubmitRequest, JobStatusResponse
-from app.services.mongo_client import create_job, get_job, update_job, get_user_by_email, update_user
-from app.core.worker import process_job
+from bson import ObjectId
+from app.core.config import settings
+from app.schemas.schemas import (
+    SubmitRequest,
+    JobStatusResponse,
+    JobHistoryResponse,
+    BatchSubmitRequest,
+    BatchStatusResponse,
+)
+from app.services.mongo_client import (
+    create_job,
+    create_jobs,
+    get_job,
+    update_job,
+    get_user_by_id,
+    list_user_jobs,
+    reserve_credits,
+    refund_credits,
+    get_batch_progress,
+    TERMINAL_JOB_STATUSES,
+)
+from app.services.job_events import JobEventStream
+from app.services.quota import has_quota_for, seconds_until_reset
+from app.services.youtube import estimate_job_quota, normalize_channel_query
+from app.utils.auth import get_current_user, get_optional_user
+from app.utils.rate_limit import submit_rate_limiter, CostOverLimitError
 
 router = APIRouter(tags=["Submit Job"])
 
+# Job document field -> JobStatusResponse field
+JOB_RESPONSE_FIELDS = {
+    "status": "status",
+    "error": "error",
+    "channel_id": "channelId",
+    "channel_name": "channelName",
+    "videos": "videos",
+    "ai_report": "aiReport",
+}
+
+
+# Response field -> job document field
+JOB_DOCUMENT_FIELDS = {name: field for field, name in JOB_RESPONSE_FIELDS.items()}
+
+# Job history leaves out the large videos and aiReport fields unless asked for
+JOB_HISTORY_FIELDS = ["status", "error", "channel_id", "channel_name"]
+
+
+def job_response(job_id: str, job: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Shape a job document as a JobStatusResponse.
+    With fields (job document field names), only those are included.
+    """
+    response = {"jobId": job_id}
+    for field, name in JOB_RESPONSE_FIELDS.items():
+        if fields is None or field in fields:
+            response[name] = job.get(field)
+    return response
+
+
+def parse_job_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Turn a comma-separated list of response fields (e.g. "status,aiReport") into
+    job document fields. status is always included since the response requires it.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in JOB_DOCUMENT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown job fields: {', '.join(unknown)}. Allowed: {', '.join(JOB_DOCUMENT_FIELDS)}",
+        )
+    return ["status"] + [JOB_DOCUMENT_FIELDS[name] for name in names if name != "status"]
+
+
+def encode_job_cursor(job: Dict[str, Any]) -> str:
+    """
+    Opaque keyset cursor pointing after a job: its created_at and ID.
+    Jobs not yet backfilled by run_migrations() use the creation time of their ID.
+    """
+    created_at = job.get("created_at") or ObjectId(job["_id"]).generation_time.replace(tzinfo=None)
+    raw = f"{created_at.isoformat()}|{job['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_job_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_job_cursor(); raises a 400 for a malformed cursor."""
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if not ObjectId.is_valid(job_id):
+            raise ValueError(job_id)
+        return datetime.fromisoformat(created_at), job_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def job_response_delta(changes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rename changed job fields (dotted paths allowed) to their response names,
+    dropping internal fields such as leases and timestamps.
+    """
+    delta = {}
+    for path, value in changes.items():
+        field, _, rest = path.partition(".")
+        if field in JOB_RESPONSE_FIELDS:
+            delta[JOB_RESPONSE_FIELDS[field] + ("." + rest if rest else "")] = value
+    return delta
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def too_many_jobs_at_once(error: CostOverLimitError) -> HTTPException:
+    """Not retryable: the request alone exceeds the plan's rate limit."""
+    return HTTPException(
+        status_code=403,
+        detail=f"The {error.plan} plan allows at most {error.limit} jobs per "
+               f"{error.window_seconds:g} seconds. Submit fewer channels at once.",
+    )
+
+
+def too_many_jobs(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many jobs submitted. Please slow down.",
+        headers={"Retry-After": str(int(retry_after) + 1)},
+    )
+
+
+def submit_rate_key(user: Optional[Dict[str, Any]], request: Request) -> str:
+    """Rate limit key of a submission: the signed-in user, or the client IP for guests."""
+    if user is None:
+        return f"guest:{request.client.host if request.client else 'unknown'}"
+    return f"user:{user['_id']}"
+
+
+async def admit_guest_job(key: str) -> None:
+    """
+    Count a guest job against the guest rate limit of the client.
+    Raises 403 when guests may not submit at all and 429 when over the limit.
+    """
+    try:
+        wait = await submit_rate_limiter.hit(key, "guest")
+    except CostOverLimitError:
+        raise HTTPException(status_code=403, detail="Sign in to submit jobs.")
+    if wait:
+        raise too_many_jobs(wait)
+
+
+async def reserve_job_credits(user: Dict[str, Any], jobs: int) -> int:
+    """
+    Charge the credits of jobs about to be created, in one conditional update, and
+    count them against the user's rate limit for their plan.
+    Raises 404 for an unknown user, 402 without enough credits, 403 when the request
+    alone exceeds the plan's rate limit and 429 when over the rate limit (the credits
+    are given back in both cases). Returns the credits charged.
+    """
+    credits = jobs * settings.credits_per_job
+    try:
+        reserved = await reserve_credits(user["_id"], credits, jobs)
+        if reserved is None:
+            if await get_user_by_id(user["_id"]) is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            raise HTTPException(
+                status_code=402,
+                detail=f"Not enough credits: {credits} needed. Upgrade your plan to submit more jobs.",
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reserve credits: {str(e)}")
+
+    try:
+        wait = await submit_rate_limiter.hit(f"user:{user['_id']}", reserved.get("plan", "free"), jobs)
+    except CostOverLimitError as e:
+        await refund_credits(user["_id"], credits, jobs)
+        raise too_many_jobs_at_once(e)
+    if wait:
+        await refund_credits(user["_id"], credits, jobs)
+        raise too_many_jobs(wait)
+    return credits
+
+
 @router.post("/submit", response_model=dict, status_code=202)
-async def submit_job(request: SubmitRequest, background: BackgroundTasks):
-    # Create initial job document
+async def submit_job(
+    request: SubmitRequest,
+    http_request: Request,
+    user: Optional[Dict[str, Any]] = Depends(get_optional_user),
+):
+    """
+    Queue the analysis of one channel.
+    Signed-in users are charged credits and rate limited by plan, and the job is
+    theirs whatever email the body carries. Guests are not charged, are rate limited
+    per client IP and get the job under the email they entered.
+    """
+    # Clients known to be over their rate limit are rejected without any I/O
+    key = submit_rate_key(user, http_request)
+    wait = submit_rate_limiter.retry_after(key)
+    if wait:
+        raise too_many_jobs(wait)
+
+    # Reject early when the job would not fit in today's YouTube quota
+    quota_estimate = estimate_job_quota(request.channelName)
+    if not await has_quota_for(quota_estimate):
+        raise HTTPException(
+            status_code=503,
+            detail="Daily YouTube API quota is exhausted. Please try again later.",
+            headers={"Retry-After": str(seconds_until_reset())},
+        )
+
+    if user is None:
+        await admit_guest_job(key)
+        credits = 0
+    else:
+        # Also counts the job on the user
+        credits = await reserve_job_credits(user, 1)
+
+    # Create initial job document; the worker pool picks it up from the queue
     try:
+        now = datetime.utcnow()
         job_doc = {
-            "email": request.email,
+            "email": user["email"] if user else request.email,
+            "user_id": user["_id"] if user else None,
             "channel_name": request.channelName,
             "services": request.services,
             "status": "queued",
-            "created_at": None,
-            "updated_at": None,
+            "quota_estimate": quota_estimate,
+            "credits_reserved": credits,
+            "attempts": 0,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "created_at": now,
+            "updated_at": now,
         }
         job_id = await create_job(job_doc)
-        
-        # Update user's job counters
-        user = await get_user_by_email(request.email)
-        if user:
-            await update_user(user["_id"], {
-                "$inc": {"total_jobs": 1, "active_jobs": 1},
-                "$push": {"job_ids": job_id}
-            })
-        
-        # Kick off background processing
-        background.add_task(process_job, job_id)
         return {"jobId": job_id}
     except Exception as e:
+        if credits:
+            await refund_credits(user["_id"], credits, 1)
         raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
 
-@router.get("/job/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str):
+@router.post("/submit/batch", response_model=dict, status_code=202)
+async def submit_batch(request: BatchSubmitRequest, user: dict = Depends(get_current_user)):
+    """
+    Submit one job per channel in a single request (agencies analysing many channels).
+    Only for signed-in users; the jobs are charged to and owned by the caller.
+    Channels that resolve to the same normalized query are submitted once.
+    Progress of the whole batch is available at /batch/{batch_id}.
+    """
+    unique: Dict[str, str] = {}
+    for name in request.channels:
+        unique.setdefault(normalize_channel_query(name), name)
+    channels = list(unique.values())
+    if len(channels) > settings.batch_max_channels:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {settings.batch_max_channels} channels",
+        )
+
+    try:
+        wait = submit_rate_limiter.retry_after(f"user:{user['_id']}", cost=len(channels))
+    except CostOverLimitError as e:
+        raise too_many_jobs_at_once(e)
+    if wait:
+        raise too_many_jobs(wait)
+
+    # The whole batch must fit in today's YouTube quota
+    quota_estimates = [estimate_job_quota(name) for name in channels]
+    if not await has_quota_for(sum(quota_estimates)):
+        raise HTTPException(
+            status_code=503,
+            detail="Daily YouTube API quota cannot cover this batch. Please try again later or submit fewer channels.",
+            headers={"Retry-After": str(seconds_until_reset())},
+        )
+
+    # All or nothing: the batch is rejected if the user cannot afford every job
+    credits = await reserve_job_credits(user, len(channels))
+
+    try:
+        now = datetime.utcnow()
+        batch_id = uuid4().hex
+        job_docs = [
+            {
+                "email": user["email"],
+                "user_id": user["_id"],
+                "channel_name": name,
+                "services": request.services,
+                "batch_id": batch_id,
+                "status": "queued",
+                "quota_estimate": quota_estimate,
+                "credits_reserved": settings.credits_per_job,
+                "attempts": 0,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for name, quota_estimate in zip(channels, quota_estimates)
+        ]
+        job_ids = await create_jobs(job_docs)
+        return {"batchId": batch_id, "jobIds": job_ids, "total": len(job_ids)}
+    except Exception as e:
+        await refund_credits(user["_id"], credits, len(channels))
+        raise HTTPException(status_code=500, detail=f"Failed to create batch: {str(e)}")
+
+@router.get("/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str):
+    """Aggregate progress of a batch: number of jobs per status."""
+    try:
+        statuses = await get_batch_progress(batch_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get batch status: {str(e)}")
+    if not statuses:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    total = sum(statuses.values())
+    finished = sum(statuses.get(status, 0) for status in TERMINAL_JOB_STATUSES)
+    return {
+        "batchId": batch_id,
+        "total": total,
+        "statuses": statuses,
+        "completed": statuses.get("completed", 0),
+        "failed": statuses.get("failed", 0),
+        "finished": finished == total,
+    }
+
+@router.get("/jobs", response_model=JobHistoryResponse, response_model_exclude_unset=True)
+async def list_jobs(
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to return, e.g. status,aiReport"),
+    user: dict = Depends(get_current_user),
+):
+    """
+    The current user's jobs, newest first, one page at a time.
+    Pass the returned nextCursor to get the next page; it is null on the last page.
+    """
+    selected = parse_job_fields(fields) or JOB_HISTORY_FIELDS
+    before = decode_job_cursor(cursor) if cursor else None
     try:
-        job = await get_job(job_id)
+        # One extra job tells whether there is a next page
+        jobs = await list_user_jobs(user["email"], limit + 1, before, {field: 1 for field in selected})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list jobs: {str(e)}")
+
+    page = jobs[:limit]
+    return {
+        "jobs": [{**job_response(job["_id"], job, selected), "createdAt": job["created_at"]} for job in page],
+        "nextCursor": encode_job_cursor(page[-1]) if len(jobs) > limit else None,
+    }
+
+@router.get("/job/{job_id}", response_model=JobStatusResponse, response_model_exclude_unset=True)
+async def get_job_status(
+    job_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields to return, e.g. status,aiReport"),
+):
+    # Only the requested fields are loaded from MongoDB and serialized
+    selected = parse_job_fields(fields)
+    projection = {field: 1 for field in selected} if selected else None
+    try:
+        job = await get_job(job_id, projection)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
-        return {
-            "jobId": job_id,
-            "status": job.get("status"),
-            "error": job.get("error"),
-            "channelId": job.get("channel_id"),
-            "channelName": job.get("channel_name"),
-            "videos": job.get("videos"),
-            "aiReport": job.get("ai_report"),
-        }
+        return job_response(job_id, job, selected)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+
+@router.get("/job/{job_id}/status", response_model=JobStatusResponse, response_model_exclude_unset=True)
+async def get_job_progress(job_id: str):
+    """Lightweight polling endpoint: only the job's status and error."""
+    try:
+        job = await get_job(job_id, {"status": 1, "error": 1})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job_response(job_id, job, ["status", "error"])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+
+@router.get("/job/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events feed of a job, replacing client-side polling of /job/{job_id}.
+
+    Events:
+        snapshot - the full job (same shape as GET /job/{job_id}), sent once
+        update   - only the fields that changed, e.g. {"status": "videos_fetched"} or
+                   {"aiReport.services.copyright_protection": {...}}
+        end      - the job reached a terminal status; the stream closes
+
+    A comment line is sent when the job is idle so proxies keep the connection open.
+    """
+    events = JobEventStream(job_id)
+    await events.__aenter__()
+    if not events.snapshot:
+        await events.__aexit__(None, None, None)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_source():
+        try:
+            status = events.snapshot.get("status")
+            yield sse_event("snapshot", job_response(job_id, events.snapshot))
+            while status not in TERMINAL_JOB_STATUSES:
+                changes = await events.next()
+                if await request.is_disconnected():
+                    return
+                if changes is None:
+                    yield ": keepalive\n\n"
+                    continue
+                delta = job_response_delta(changes)
+                if delta:
+                    status = delta.get("status", status)
+                    yield sse_event("update", delta)
+            yield sse_event("end", {"status": status})
+        finally:
+            await events.__aexit__(None, None, None)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,24 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 
 class SubmitRequest(BaseModel):
-    email: EmailStr = Field(..., description="User email address")
+    email: EmailStr = Field(..., description="User email address (signed-in users get the job under their account email)")
     channelName: str = Field(..., description="YouTube channel name or handle")
     services: List[str] = Field(default_factory=list, description="Optional list of extra services")
 
+class BatchSubmitRequest(BaseModel):
+    channels: List[str] = Field(..., min_length=1, description="YouTube channel names or handles, one job each")
+    services: List[str] = Field(default_factory=list, description="Optional list of extra services, applied to every channel")
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str = Field(..., alias="batchId")
+    total: int = Field(..., description="Number of jobs in the batch")
+    statuses: Dict[str, int] = Field(..., description="Number of jobs per status")
+    completed: int
+    failed: int
+    finished: bool = Field(..., description="True once every job is completed or failed")
+
 class VideoInfo(BaseModel):
     title: str
     description: str
@@ -20,6 +33,11 @@ class JobStatusResponse(BaseModel):
     channelName: Optional[str] = None
     videos: Optional[List[VideoInfo]] = None
     aiReport: Optional[Dict[str, Any]] = None  # Changed from str to Dict to support structured analysis
+    createdAt: Optional[datetime] = None
+
+class JobHistoryResponse(BaseModel):
+    jobs: List[JobStatusResponse]
+    nextCursor: Optional[str] = Field(None, description="Cursor of the next page, null on the last page")
 
 
 # Authentication Schemas
@@ -188,3 +206,21 @@ class TypedAIServicesResponse(BaseModel):
     copyright_protection: Optional[CopyrightProtection] = None
     fair_use_analysis: Optional[FairUseAnalysis] = None
     trend_intelligence: Optional[TrendIntelligence] = None
+
+
+
+# Envelope used as the response schema in structured output mode
+class AIReportResponse(BaseModel):
+    """AI report as returned by Gemini: {"services": {...}}"""
+    services: TypedAIServicesResponse
+
+
+# Service name -> schema used to validate each service's section of the report
+SERVICE_RESPONSE_SCHEMAS = {
+    "semantic_title_engine": SemanticTitleEngine,
+    "predictive_ctr_analysis": PredictiveCTRAnalysis,
+    "multi_platform_mastery": MultiPlatformMastery,
+    "copyright_protection": CopyrightProtection,
+    "fair_use_analysis": FairUseAnalysis,
+    "trend_intelligence": TrendIntelligence,
+}
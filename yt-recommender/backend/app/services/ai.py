@@ -1,9 +1,40 @@
 import json
+import asyncio
+import httpx
 from google import genai
-from google.genai import types
-from typing import List, Dict, Any
+from google.genai import types, errors
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from pydantic import ValidationError
 from app.core.config import settings
+from app.services import ai_cache
+from app.schemas.schemas import SERVICE_RESPONSE_SCHEMAS, AIReportResponse
+from app.utils.json_stream import ServiceStreamParser
+from app.services.prompts import PROMPT_TEMPLATE, PROMPT_TEMPLATE_VERSION, SYSTEM_INSTRUCTION
+from app.services.gemini_context import StaticContextCache
+from app.services.fake_genai import FakeGenaiClient
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Only the newest videos are sent to Gemini
+PROMPT_VIDEO_COUNT = 3
+
+
+
+# Awaited with (service_name, result) as each service's analysis completes
+ServiceResultCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Bounds concurrent per-service Gemini requests across all jobs in this process
+_gemini_slots = asyncio.Semaphore(settings.gemini_max_concurrency)
+
+# Shared Gemini client (singleton) and the pooled HTTP client it sends requests through
+_genai_client: Optional[genai.Client] = None
+_genai_http_client: Optional[httpx.AsyncClient] = None
+
+# JSON schema of the report, used in structured output mode
+_REPORT_JSON_SCHEMA = AIReportResponse.model_json_schema()
+
+# Static prompt prefix registered as Gemini cached context
+static_context = StaticContextCache(GEMINI_MODEL)
 
 # Service ID to name mapping
 SERVICE_MAP = {
@@ -16,7 +47,51 @@ SERVICE_MAP = {
 }
 
 
-async def analyse(videos: List[Dict[str, Any]], channel_stats: Dict[str, Any] = None, services: List[str] = None) -> Dict[str, Any]:
+def get_genai_client() -> genai.Client:
+    """
+    Returns a shared Gemini client.
+    Created lazily and reused by every worker so TLS sessions and pooled
+    keep-alive connections survive between jobs.
+    """
+    global _genai_client, _genai_http_client
+    if _genai_client is None and settings.gemini_client_mode == "fake":
+        _genai_client = FakeGenaiClient()
+    if _genai_client is None:
+        _genai_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.gemini_max_connections,
+                max_keepalive_connections=settings.gemini_max_keepalive_connections,
+                keepalive_expiry=settings.gemini_keepalive_expiry_seconds,
+            ),
+            timeout=settings.gemini_timeout_seconds,
+        )
+        _genai_client = genai.Client(
+            api_key=settings.gemini_api_key,
+            http_options=types.HttpOptions(
+                timeout=int(settings.gemini_timeout_seconds * 1000),  # milliseconds
+                httpx_async_client=_genai_http_client,
+            ),
+        )
+    return _genai_client
+
+
+async def close_genai_client():
+    global _genai_client, _genai_http_client
+    if _genai_client is not None:
+        await static_context.release(_genai_client)
+        await _genai_client.aio.aclose()
+        _genai_client = None
+    if _genai_http_client is not None:
+        await _genai_http_client.aclose()
+        _genai_http_client = None
+
+
+async def analyse(
+    videos: List[Dict[str, Any]],
+    channel_stats: Dict[str, Any] = None,
+    services: List[str] = None,
+    on_service_result: Optional[ServiceResultCallback] = None,
+) -> Dict[str, Any]:
     """
     Analyze YouTube videos using Gemini-2.5-flash with service-specific analysis.
     
@@ -24,263 +99,245 @@ async def analyse(videos: List[Dict[str, Any]], channel_stats: Dict[str, Any] =
         videos: List of video dictionaries with title, description, url, statistics
         channel_stats: Optional channel statistics
         services: List of service IDs selected by user
+        on_service_result: Optional async callback(service_name, result), awaited as soon as
+            each service's result is available when per-service calls are enabled
         
     Returns:
         Dictionary with service-specific analysis results
     """
-    if not settings.gemini_api_key:
+    if not settings.gemini_api_key and settings.gemini_client_mode != "fake":
         return get_fallback_analysis(videos, services)
     
+    services = [sid for sid in (services or []) if sid in SERVICE_MAP]
+    if not services:
+        try:
+            return await call_gemini_api(videos, channel_stats, services)
+        except Exception as e:
+            print(f"Gemini API failed, using fallback: {str(e)}")
+            return get_fallback_analysis(videos, services)
+
+    # Serve services analysed before with the same inputs from the cache
+    videos_to_analyze = videos[:PROMPT_VIDEO_COUNT]
+    keys = {
+        sid: ai_cache.cache_key(videos_to_analyze, sid, PROMPT_TEMPLATE_VERSION)
+        for sid in services
+    }
+    cached = await ai_cache.get_many(keys)
+    result = {"services": {SERVICE_MAP[sid]: cached[sid] for sid in services if sid in cached}}
+    missing = [sid for sid in services if sid not in cached]
+    if not missing:
+        return result
+
+    if settings.gemini_per_service_calls:
+        fresh = await _analyse_per_service(videos, channel_stats, missing, keys, on_service_result)
+    else:
+        fresh = await _analyse_combined(videos, channel_stats, missing, keys, on_service_result)
+
+    merged = {**result["services"], **fresh}
+    ordered = {SERVICE_MAP[sid]: merged[SERVICE_MAP[sid]] for sid in services if SERVICE_MAP[sid] in merged}
+    return {"services": {**ordered, **merged}}
+
+
+async def _analyse_combined(
+    videos: List[Dict[str, Any]],
+    channel_stats: Dict[str, Any],
+    services: List[str],
+    keys: Dict[str, str],
+    on_service_result: Optional[ServiceResultCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Analyse all services with a single prompt. Services that are missing or invalid
+    fall back alone. When a streamed call fails part way, the services already
+    validated (and published) are kept and only the others fall back.
+    Sections for services that were not requested are dropped.
+    """
+    requested = {SERVICE_MAP[sid] for sid in services}
+    streamed: Dict[str, Any] = {}
+
+    async def collect(name: str, service_result: Dict[str, Any]):
+        if name not in requested:
+            return
+        streamed[name] = service_result
+        if on_service_result is not None:
+            await on_service_result(name, service_result)
+
     try:
-        return await call_gemini_api(videos, channel_stats, services)
+        fresh = (await call_gemini_api(videos, channel_stats, services, collect)).get("services", {})
     except Exception as e:
-        print(f"Gemini API failed, using fallback: {str(e)}")
-        return get_fallback_analysis(videos, services)
+        print(f"Gemini API failed, using fallback for {len(requested) - len(streamed)} services: {str(e)}")
+        fresh = {}
+
+    results = {}
+    for sid in services:
+        name = SERVICE_MAP[sid]
+        service_result = streamed.get(name) or fresh.get(name)
+        if _is_valid_service_result(name, service_result):
+            results[name] = service_result
+            await ai_cache.store(keys[sid], name, service_result)
+        else:
+            print(f"Gemini response has no valid '{name}' section, using fallback")
+            results[name] = get_fallback_analysis(videos, [sid])["services"][name]
+    return results
+
+
+async def _analyse_per_service(
+    videos: List[Dict[str, Any]],
+    channel_stats: Dict[str, Any],
+    services: List[str],
+    keys: Dict[str, str],
+    on_service_result: Optional[ServiceResultCallback],
+) -> Dict[str, Any]:
+    """
+    Send one smaller request per service, concurrently under a bounded semaphore.
+    A failing service falls back on its own; the others keep their Gemini results.
+    """
+    async def run(sid: str):
+        name = SERVICE_MAP[sid]
+        try:
+            async with _gemini_slots:
+                response = await call_gemini_api(videos, channel_stats, [sid])
+            service_result = response.get("services", {}).get(name)
+            if not _is_valid_service_result(name, service_result):
+                raise ValueError(f"Gemini response has no valid '{name}' section")
+            await ai_cache.store(keys[sid], name, service_result)
+        except Exception as e:
+            print(f"Gemini API failed for {name}, using fallback: {str(e)}")
+            service_result = get_fallback_analysis(videos, [sid])["services"][name]
 
+        if on_service_result is not None:
+            try:
+                await on_service_result(name, service_result)
+            except Exception as e:
+                print(f"Failed to publish partial result for {name}: {str(e)}")
+        return name, service_result
 
-async def call_gemini_api(videos: List[Dict[str, Any]], channel_stats: Dict[str, Any] = None, services: List[str] = None) -> Dict[str, Any]:
+    results = await asyncio.gather(*(run(sid) for sid in services))
+    return dict(results)
+
+
+def _is_valid_service_result(name: str, service_result: Any) -> bool:
+    """
+    A service section is usable when present and shaped like its schema (if it has one).
+    Only schema-constrained output is validated strictly; free-form JSON just needs
+    the schema's top-level fields, since details such as a rating of "8" or four
+    alternative titles are still usable and a fallback would waste the call.
+    """
+    if not service_result:
+        return False
+    schema = SERVICE_RESPONSE_SCHEMAS.get(name)
+    if schema is None:
+        return True
+    if not isinstance(service_result, dict):
+        return False
+    if not settings.gemini_structured_output:
+        missing = [field for field, info in schema.model_fields.items() if info.is_required() and field not in service_result]
+        if missing:
+            print(f"Gemini returned an incomplete '{name}' section (missing {', '.join(missing)})")
+            return False
+        return True
+    try:
+        schema.model_validate(service_result)
+    except ValidationError as e:
+        print(f"Gemini returned an invalid '{name}' section ({e.error_count()} validation errors)")
+        return False
+    return True
+
+
+async def call_gemini_api(
+    videos: List[Dict[str, Any]],
+    channel_stats: Dict[str, Any] = None,
+    services: List[str] = None,
+    on_service_result: Optional[ServiceResultCallback] = None,
+) -> Dict[str, Any]:
     """Call Gemini API with service-specific prompts."""
     
-    # Build video details for prompt (take last 3 videos)
-    videos_to_analyze = videos[:3] if len(videos) > 3 else videos
-    
-    video_details = "\n".join([
-        f"""
-VIDEO {i + 1}:
-- Title: "{v.get('title', 'N/A')}"
-- Description: {v.get('description', 'N/A')[:200]}...
-- Views: {v.get('statistics', {}).get('viewCount', 'N/A')}
-- Likes: {v.get('statistics', {}).get('likeCount', 'N/A')}
-- Comments: {v.get('statistics', {}).get('commentCount', 'N/A')}
-"""
-        for i, v in enumerate(videos_to_analyze)
-    ])
-    
-    # Build service-specific prompt
-    service_instructions = build_service_instructions(services or [])
-    
-    prompt = f"""
-You are an AI-powered YouTube Intelligence Suite used by professional creators and growth teams.
-
-You do NOT give generic advice.
-You produce EXECUTABLE INSIGHTS that can be shown directly in a product dashboard.
-
-===========================
-CHANNEL VIDEO DATA
-===========================
-{video_details}
-
-===========================
-REQUESTED SERVICES
-===========================
-{service_instructions}
-
-===========================
-SERVICE EXECUTION RULES
-===========================
-- Execute ONLY the services explicitly requested
-- Do NOT include services that were not requested
-- Each service must be clearly separated in the output
-- Every score, rating, or risk level MUST include reasoning
-- Avoid vague phrases like "could be improved" or "might work"
-- Be decisive, confident, and specific
-
-===========================
-SERVICE-SPECIFIC EXPECTATIONS
-===========================
-
-SEMANTIC TITLE ENGINE
-- Titles must be platform-native (YouTube style)
-- Use curiosity gaps, specificity, emotional triggers
-- Avoid clickbait without payoff
-- Clearly explain WHY each alternative works better
-- Ratings must reflect realistic CTR potential
-
-PREDICTIVE CTR ANALYSIS
-- Scores must reflect title + thumbnail psychology
-- Highlight concrete weaknesses (length, clarity, emotion, promise)
-- Recommend specific changes (words, numbers, framing)
-- Assume creator wants maximum clicks without misleading viewers
-
-MULTI-PLATFORM MASTERY
-- Do NOT repeat the same advice across platforms
-- Respect platform-native behavior (scroll speed, hook time)
-- Suggest concrete adaptations, not reposting
-- Optimize for algorithmic discovery, not followers
-
-COPYRIGHT PROTECTION
-- Be conservative and risk-aware
-- Flag even borderline risks
-- Assume Content ID systems, not manual review
-- Provide safe, creator-friendly alternatives
-
-FAIR USE ANALYSIS
-- Assess transformation, not intent
-- Consider education, commentary, critique
-- Be explicit about risk boundaries
-- Provide actionable legal safety guidance (not legal disclaimers)
-
-TREND INTELLIGENCE
-- Focus on EARLY signals, not obvious trends
-- Avoid generic topics everyone already covers
-- Prioritize actionable next-video ideas
-- Think in a 24-72 hour opportunity window
-
-===========================
-OUTPUT FORMAT (STRICT)
-===========================
-Return VALID JSON ONLY.
-No markdown. No explanations outside JSON.
-
-CRITICAL: Follow this EXACT schema. Do not add, remove, or rename fields.
-Use the exact field names shown below (case-sensitive, with underscores).
-
-JSON STRUCTURE:
-{{
-  "services": {{
-    "semantic_title_engine": {{
-      "channel_analysis": {{
-        "overall_assessment": "string - detailed channel title strategy analysis"
-      }},
-      "suggestions": [
-        {{
-          "original_title": "string - exact current title",
-          "current_issues": ["string issue 1", "string issue 2", "string issue 3"],
-          "alternative_titles": [
-            {{
-              "new_suggested_title": "string - alternative title",
-              "ctr_potential_rating": 8,
-              "why_it_s_effective": "string - psychology explanation"
-            }},
-            {{
-              "new_suggested_title": "string - alternative title 2",
-              "ctr_potential_rating": 7,
-              "why_it_s_effective": "string - psychology explanation"
-            }},
-            {{
-              "new_suggested_title": "string - alternative title 3",
-              "ctr_potential_rating": 9,
-              "why_it_s_effective": "string - psychology explanation"
-            }}
-          ]
-        }}
-      ],
-      "growth_tips": ["string tip 1", "string tip 2", "string tip 3"]
-    }},
-    
-    "predictive_ctr_analysis": {{
-      "score": 5.5,
-      "reasoning": "string - explanation of score",
-      "comparison_to_industry_average": "string - industry comparison",
-      "what_is_working_or_missing": {{
-        "working": "string paragraph - what's working well",
-        "missing": "string paragraph - what's missing"
-      }},
-      "recommendations": ["string rec 1", "string rec 2", "string rec 3"],
-      "potential_increase": "30-50%",
-      "psychological_triggers_to_boost_engagement": ["string trigger 1", "string trigger 2"]
-    }},
-    
-    "multi_platform_mastery": {{
-      "platforms": {{
-        "youtube": {{
-          "score": 9,
-          "reasoning": "string - why this score",
-          "strategy": "string - platform-specific strategy",
-          "optimization_tips": ["string tip 1", "string tip 2"]
-        }},
-        "x_twitter": {{
-          "score": 6,
-          "reasoning": "string - why this score",
-          "strategy": "string - platform-specific strategy",
-          "optimization_tips": ["string tip 1", "string tip 2"]
-        }},
-        "linkedin": {{
-          "score": 7,
-          "reasoning": "string - why this score",
-          "strategy": "string - platform-specific strategy",
-          "optimization_tips": ["string tip 1", "string tip 2"]
-        }}
-      }}
-    }},
-    
-    "copyright_protection": {{
-      "risk_level": "LOW",
-      "flags": ["string flag 1", "string flag 2"],
-      "assessment": "string - detailed assessment",
-      "recommendations": ["string rec 1", "string rec 2"]
-    }},
-    
-    "fair_use_analysis": {{
-      "score": 90,
-      "reasoning": "string - explanation of score",
-      "assessment": "string - detailed fair use assessment",
-      "fair_use_factors_breakdown": {{
-        "purpose_and_character": {{
-          "score": 9,
-          "reasoning": "string - explanation"
-        }},
-        "nature_of_work": {{
-          "score": 8,
-          "reasoning": "string - explanation"
-        }},
-        "amount_used": {{
-          "score": 7,
-          "reasoning": "string - explanation"
-        }},
-        "market_effect": {{
-          "score": 9,
-          "reasoning": "string - explanation"
-        }}
-      }},
-      "recommendation_for_legal_safety": "string - actionable legal guidance"
-    }},
-    
-    "trend_intelligence": {{
-      "trending_topics": [
-        {{
-          "name": "string - topic name",
-          "growth_percentage": "12%",
-          "relevance_rating": 9,
-          "reasoning": "string - why relevant"
-        }}
-      ],
-      "predictions": ["string prediction 1", "string prediction 2"],
-      "actionable_content_ideas": ["string idea 1", "string idea 2"]
-    }}
-  }}
-}}
-
-FIELD NAME RULES:
-- Use snake_case (underscores): "channel_analysis", "current_issues", "why_it_s_effective"
-- NOT camelCase: "channelAnalysis", "currentIssues", "whyItsEffective"
-- risk_level values: "LOW", "MEDIUM", or "HIGH" (uppercase)
-- Scores are numbers (not strings): 5.5, 90, 8
-- Arrays must contain strings or objects as shown above
-
-Remember:
-- Include ONLY requested services
-- Be concise, concrete, and product-ready
-"""
+    # Prompt inputs (take last 3 videos)
+    videos_to_analyze = videos[:PROMPT_VIDEO_COUNT]
+    services = services or []
+
+    # Shared Gemini client
+    client = get_genai_client()
+
+    # Services already handed to on_service_result; a retry does not publish them again
+    published: Dict[str, Any] = {}
+
+    async def publish_once(name: str, service_result: Dict[str, Any]):
+        if name in published:
+            return
+        await on_service_result(name, service_result)
+        published[name] = service_result
+
+    publish = publish_once if on_service_result is not None else None
+
+    # With context caching, the static prefix lives on the server and only the per-job part is sent
+    cached_context = await static_context.get_name(client) if settings.gemini_context_cache else None
+    if cached_context:
+        try:
+            return await _generate_report(
+                client,
+                PROMPT_TEMPLATE.render_dynamic(videos_to_analyze, services),
+                _generation_config(cached_content=cached_context),
+                publish,
+            )
+        except errors.ClientError as e:
+            print(f"Gemini call with cached context failed, sending full prompt: {str(e)}")
+            static_context.invalidate()
+
+    report = await _generate_report(
+        client,
+        PROMPT_TEMPLATE.render(videos_to_analyze, services),
+        _generation_config(system_instruction=SYSTEM_INSTRUCTION),
+        publish,
+    )
+    # Keep the versions clients have already seen
+    report["services"] = {**report.get("services", {}), **published}
+    return report
+
+
+def _generation_config(**kwargs) -> types.GenerateContentConfig:
+    """
+    Generation settings shared by every request. In structured output mode Gemini is
+    constrained to the AIReportResponse JSON schema. It is passed as
+    response_json_schema because the Developer API's response_schema cannot express
+    the open-ended platforms map of multi_platform_mastery.
+    """
+    if settings.gemini_structured_output:
+        kwargs.update(
+            response_mime_type="application/json",
+            response_json_schema=_REPORT_JSON_SCHEMA,
+        )
+    return types.GenerateContentConfig(temperature=0.7, **kwargs)
+
+
+async def _generate_report(
+    client: genai.Client,
+    prompt: str,
+    config: types.GenerateContentConfig,
+    on_service_result: Optional[ServiceResultCallback] = None,
+) -> Dict[str, Any]:
+    """Send one prompt to Gemini and parse the JSON report it returns."""
+    print(f"Calling Gemini API... (prompt length: {len(prompt)}, cached context: {bool(config.cached_content)})")
+
+    if settings.gemini_stream_responses:
+        return await _stream_gemini_response(client, prompt, config, on_service_result)
 
-    
-    print(f"Calling Gemini API with {len(services or [])} services... (prompt length: {len(prompt)})")
-    
-    # Initialize Gemini client
-    client = genai.Client(api_key=settings.gemini_api_key)
-    
     # Call Gemini API
     response = await client.aio.models.generate_content(
-        model='gemini-2.5-flash',
+        model=GEMINI_MODEL,
         contents=prompt,
-        config=types.GenerateContentConfig(
-            temperature=0.7,
-            system_instruction="You are an expert YouTube content strategist. Always respond with valid JSON only."
-        )
+        config=config
     )
     
     response_text = response.text
     print(f"Gemini response received (length: {len(response_text)})")
+
+    if settings.gemini_structured_output:
+        # Schema-constrained output: decode and validate in one pass
+        try:
+            report = AIReportResponse.model_validate_json(response_text)
+        except ValidationError as e:
+            raise ValueError(f"Gemini response does not match the report schema ({e.error_count()} errors)")
+        return {"services": report.services.model_dump(exclude_none=True)}
     
     # Parse JSON from response
     try:
@@ -292,108 +349,51 @@ Remember:
         
     except json.JSONDecodeError as parse_error:
         print(f"Failed to parse Gemini response as JSON: {str(parse_error)}")
-        # Return fallback
-        return get_fallback_analysis(videos, services)
+        # Let analyse() fall back, so a fallback report is never cached
+        raise ValueError(f"Invalid JSON from Gemini: {str(parse_error)}")
 
 
-def build_service_instructions(services: List[str]) -> str:
-    """Build prompt instructions based on selected services."""
-    
-    instructions = "PERFORM THE FOLLOWING ANALYSES:\n\n"
-    
-    service_prompts = {
-        "1": """1. SEMANTIC TITLE ENGINE (LLM-Driven Headline Generation):
-   
-   For EACH VIDEO, provide:
-   - **Channel Analysis**: Overall assessment of the channel's title strategy, content themes, and approach
-   - **Original Title**: State the current title exactly as it appears
-   - **Current Issues**: List 2-4 specific problems with the title (use bullet points)
-   - **3 Alternative Titles**: Each with:
-     * The new suggested title
-     * CTR Potential rating (0-10 scale)
-     * "Why It's Effective": Explain the psychology (curiosity gap, power words, emotional triggers, etc.)
-   - **Growth Tips**: 3-5 actionable recommendations for improving the channel's overall title strategy
-   
-   CRITICAL RULES:
-   - Be HIGHLY specific about what's wrong with current titles
-   - Make alternatives DRASTICALLY different from originals
-   - Focus on CTR psychology: curiosity gaps, specificity, emotional triggers, power words
-   - Avoid generic advice - give concrete, implementable suggestions
-   - Growth tips should be unique to this channel's niche and style""",
-        
-        "2": """2. PREDICTIVE CTR ANALYSIS (Thumbnail Saliency Mapping):
-   - Estimate overall channel CTR (0-100%)
-   - Compare to industry average
-   - Identify what's working or missing in titles/thumbnails
-   - Provide 4-6 specific, actionable recommendations to improve click-through rates
-   - Include "Potential Increase" estimate with optimizations
-   - Highlight psychological triggers that could boost engagement""",
-        
-        "3": """3. MULTI-PLATFORM MASTERY (Cross-Platform Algorithm Alignment):
-   - Analyze how this content would perform on:
-     * YouTube (long-form, algorithm preferences)
-     * X / Twitter (short-form threads, viral hooks)
-     * LinkedIn (professional networking, thought leadership)
-   - For EACH platform provide:
-     * Score (0-10)
-     * Strategy (specific to that platform's algorithm)
-     * Optimization tips (concrete actions)
-   - Do NOT repeat the same advice across platforms
-   - Suggest content adaptations, not just reposting""",
-        
-        "7": """4. COPYRIGHT PROTECTION (Content ID Scanning Pre-Upload):
-   
-   IMPORTANT: Only flag ACTUAL copyright issues:
-   - Background music from copyrighted sources
-   - Clips from other creators' videos
-   - Copyrighted images, logos, or graphics
-   - Brand names used commercially
-   
-   DO NOT FLAG:
-   - Educational content about technical topics
-   - Original creator commentary
-   - Tutorial/educational video content
-   - Technical terms or concepts
-   
-   Provide:
-   - Risk Level: LOW, MEDIUM, or HIGH (be conservative - most educational content is LOW)
-   - Flags: List ONLY actual copyrighted material detected
-   - Assessment: Brief explanation
-   - Recommendations: Safe alternatives if risks found""",
-        
-        "8": """5. FAIR USE ANALYSIS (Transformative Content Assessment):
-   - Evaluate transformativeness of the content (0-100 score)
-   - Assess commentary, criticism, or educational value
-   - Break down fair use factors:
-     * Purpose (educational/commentary)
-     * Nature (factual/creative)
-     * Amount used
-     * Market effect
-   - Provide clear recommendation for legal safety""",
-        
-        "10": """6. TREND INTELLIGENCE (48-Hour Early Trend Detection):
-   - Identify 3-5 trending topics related to this channel's niche
-   - For each topic: name, growth percentage, relevance rating
-   - Provide 3-5 specific predictions for the next 24-72 hours
-   - Suggest 3-5 actionable content ideas aligned with emerging trends
-   - Focus on EARLY signals, not obvious trends everyone already covers"""
-    }
-    
-    for service_id in services:
-        if service_id in service_prompts:
-            instructions += service_prompts[service_id] + "\n\n"
-    
-    if not instructions.strip().endswith("ANALYSES:"):
-        return instructions
-    else:
-        # If no services selected, do basic analysis
-        return "Provide a general channel overview and basic recommendations."
+async def _stream_gemini_response(
+    client: genai.Client,
+    prompt: str,
+    config: types.GenerateContentConfig,
+    on_service_result: Optional[ServiceResultCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Stream the Gemini response and parse it incrementally.
+    Each service object is validated against its schema as soon as it is closed
+    and handed to on_service_result; services that fail validation are left out.
+    """
+    parser = ServiceStreamParser()
+    services: Dict[str, Any] = {}
+
+    stream = await client.aio.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=config
+    )
+    async for chunk in stream:
+        for name, service_result in parser.feed(chunk.text or ""):
+            if not _is_valid_service_result(name, service_result):
+                continue
+
+            services[name] = service_result
+            if on_service_result is not None:
+                try:
+                    await on_service_result(name, service_result)
+                except Exception as e:
+                    print(f"Failed to publish partial result for {name}: {str(e)}")
+
+    print(f"Gemini stream finished (length: {len(parser.text)}, services: {len(services)})")
+    if not services:
+        raise ValueError("Gemini stream contained no valid service results")
+    return {"services": services}
 
 
 def get_fallback_analysis(videos: List[Dict[str, Any]], services: List[str] = None) -> Dict[str, Any]:
     """Fallback analysis when Gemini API is unavailable."""
     
-    videos_to_analyze = videos[:3] if len(videos) > 3 else videos
+    videos_to_analyze = videos[:PROMPT_VIDEO_COUNT]
     services = services or []
     
     result = {"services": {}}
@@ -0,0 +1,127 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Set
+from app.core.config import settings
+from app.services.mongo_client import get_db
+from app.models.models import AI_CACHE_COLLECTION
+from app.utils.cache import TTLCache
+
+# In-process tier (cache key -> service result); kept short so invalidations in
+# other processes become visible quickly
+_memory_cache = TTLCache(
+    maxsize=settings.ai_cache_memory_size,
+    ttl=min(settings.ai_cache_memory_ttl_seconds, settings.ai_cache_ttl_seconds),
+)
+# Service name -> cache keys it may have in the memory tier, for invalidate_service()
+_memory_keys: Dict[str, Set[str]] = {}
+
+
+def _remember(key: str, service_name: str, result: Dict[str, Any]):
+    """Put a result in the memory tier, indexed by its service."""
+    _memory_cache.set(key, result)
+    keys = _memory_keys.setdefault(service_name, set())
+    keys.add(key)
+    if len(keys) > settings.ai_cache_memory_size:
+        # Forget keys the memory tier has already evicted or expired
+        keys.intersection_update([k for k in keys if k in _memory_cache])
+
+
+def _bucket(value: Any) -> Any:
+    """Round a statistic to two significant figures so small changes keep the same key."""
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return None
+    if n < 100:
+        return n
+    magnitude = 10 ** (len(str(n)) - 2)
+    return n // magnitude * magnitude
+
+
+def cache_key(videos: List[Dict[str, Any]], service_id: str, template_version: str) -> str:
+    """
+    Content address of one service's analysis: a hash of the normalized prompt inputs
+    (video IDs, titles, truncated descriptions, bucketed statistics), the service
+    and the prompt template version.
+    """
+    normalized = {
+        "v": template_version,
+        "service": service_id,
+        "videos": [
+            {
+                "id": v.get("video_id"),
+                "title": (v.get("title") or "").strip(),
+                "description": (v.get("description") or "")[:200].strip(),
+                "stats": {
+                    name: _bucket((v.get("statistics") or {}).get(name))
+                    for name in ("viewCount", "likeCount", "commentCount")
+                },
+            }
+            for v in videos
+        ],
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def get_many(keys: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up several service results at once.
+    keys maps service ID -> cache key; returns service ID -> cached result for hits.
+    """
+    hits: Dict[str, Dict[str, Any]] = {}
+    missing: Dict[str, str] = {}
+    for service_id, key in keys.items():
+        result = _memory_cache.get(key)
+        if result is not None:
+            hits[service_id] = result
+        else:
+            missing[key] = service_id
+
+    if missing:
+        try:
+            cursor = get_db()[AI_CACHE_COLLECTION].find({
+                "_id": {"$in": list(missing)},
+                "expires_at": {"$gt": datetime.utcnow()},
+            })
+            async for doc in cursor:
+                _remember(doc["_id"], doc.get("service"), doc["result"])
+                hits[missing[doc["_id"]]] = doc["result"]
+        except Exception as e:
+            print(f"AI cache lookup failed: {str(e)}")
+
+    return hits
+
+
+async def store(key: str, service_name: str, result: Dict[str, Any]):
+    """Cache one service's analysis result in memory and MongoDB."""
+    _remember(key, service_name, result)
+    collection = get_db()[AI_CACHE_COLLECTION]
+    try:
+        now = datetime.utcnow()
+        await collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "service": service_name,
+                "result": result,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=settings.ai_cache_ttl_seconds),
+            }},
+            upsert=True,
+        )
+    except Exception as e:
+        print(f"AI cache write failed: {str(e)}")
+
+
+async def invalidate_service(service_name: str) -> int:
+    """
+    Drop every cached result of one service (e.g. after changing its prompt).
+    Returns the number of MongoDB entries removed. Other processes keep serving
+    their in-memory copies for at most the memory TTL.
+    """
+    for key in _memory_keys.pop(service_name, set()):
+        _memory_cache.pop(key)
+    result = await get_db()[AI_CACHE_COLLECTION].delete_many({"service": service_name})
+    return result.deleted_count
+
@@ -1,34 +1,88 @@
-import cloudinary
-import cloudinary.uploader
+import time
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from cloudinary.utils import api_sign_request
+from fastapi import UploadFile
 from app.core.config import settings
-from typing import Optional
 
-# Configure Cloudinary
-cloudinary.config(
-    cloud_name=settings.cloudinary_cloud_name,
-    api_key=settings.cloudinary_api_key,
-    api_secret=settings.cloudinary_api_secret
-)
+UPLOAD_API_URL = "https://api.cloudinary.com/v1_1"
 
+# Incoming transformation for avatars that were not prepared locally
+AVATAR_TRANSFORMATION = "c_fill,g_face,h_400,w_400/q_auto/f_auto"
 
-async def upload_avatar(file_content: bytes, user_id: str) -> dict:
+# Size of the pieces read from the uploaded file while checking its size
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Shared HTTP client (singleton)
+_client: Optional[httpx.AsyncClient] = None
+
+
+class AvatarTooLargeError(ValueError):
+    """Raised while reading an avatar that exceeds avatar_max_bytes."""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=f"{UPLOAD_API_URL}/{settings.cloudinary_cloud_name}",
+            timeout=settings.cloudinary_timeout_seconds,
+        )
+    return _client
+
+
+def _signed_params(params: Dict[str, str]) -> Dict[str, str]:
+    """Add the API key, timestamp and signature required by the upload API."""
+    params = {**params, "timestamp": str(int(time.time()))}
+    params["signature"] = api_sign_request(params, settings.cloudinary_api_secret)
+    params["api_key"] = settings.cloudinary_api_key
+    return params
+
+
+async def read_upload(upload: UploadFile, max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Yield an uploaded file in chunks, raising AvatarTooLargeError as soon as more
+    than max_bytes have been read (the declared size is checked up front).
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise AvatarTooLargeError(f"Avatar exceeds the {max_bytes // 1024} KB size limit")
+    total = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        total += len(chunk)
+        if total > max_bytes:
+            raise AvatarTooLargeError(f"Avatar exceeds the {max_bytes // 1024} KB size limit")
+        yield chunk
+
+
+async def upload_avatar(
+    content: bytes,
+    user_id: str,
+    content_type: str = "application/octet-stream",
+    transformation: Optional[str] = AVATAR_TRANSFORMATION,
+) -> dict:
     """
     Upload user avatar to Cloudinary
     Returns dict with url and public_id
     """
+    params = {
+        "folder": "avatars",
+        "public_id": f"user_{user_id}",
+        "overwrite": "true",
+        "invalidate": "true",  # Purge the CDN copy of the previous avatar
+    }
+    if transformation:
+        params["transformation"] = transformation
     try:
-        result = cloudinary.uploader.upload(
-            file_content,
-            folder="avatars",
-            public_id=f"user_{user_id}",
-            overwrite=True,
-            resource_type="image",
-            transformation=[
-                {"width": 400, "height": 400, "crop": "fill", "gravity": "face"},
-                {"quality": "auto"},
-                {"fetch_format": "auto"}
-            ]
+        response = await get_http_client().post(
+            "/image/upload",
+            data=_signed_params(params),
+            files={"file": (f"user_{user_id}", content, content_type)},
         )
+        response.raise_for_status()
+        result = response.json()
         return {
             "url": result.get("secure_url"),
             "public_id": result.get("public_id")
@@ -43,7 +97,26 @@ async def delete_avatar(public_id: str) -> bool:
     Returns True if successful
     """
     try:
-        result = cloudinary.uploader.destroy(public_id)
-        return result.get("result") == "ok"
+        response = await get_http_client().post(
+            "/image/destroy",
+            data=_signed_params({"public_id": public_id, "invalidate": "true"}),
+        )
+        response.raise_for_status()
+        return response.json().get("result") == "ok"
     except Exception as e:
         raise Exception(f"Failed to delete avatar: {str(e)}")
+
+
+async def delete_avatar_quietly(public_id: str):
+    """Background variant of delete_avatar: failures are only logged."""
+    try:
+        await delete_avatar(public_id)
+    except Exception as e:
+        print(f"Could not delete avatar {public_id}: {str(e)}")
+
+
+async def close_http_client():
+    global _client
+    if _client:
+        await _client.aclose()
+        _client = None
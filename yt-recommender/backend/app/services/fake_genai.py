@@ -0,0 +1,64 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from uuid import uuid4
+
+
+class _FakeModels:
+    def __init__(self, calls: List[Dict[str, Any]]):
+        self._calls = calls
+
+    def _record(self, model: str, contents: Any, config: Any) -> str:
+        self._calls.append({"model": model, "contents": contents, "config": config})
+        return json.dumps({"services": {}})
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None):
+        return SimpleNamespace(text=self._record(model, contents, config))
+
+    async def generate_content_stream(self, *, model: str, contents: Any, config: Any = None):
+        text = self._record(model, contents, config)
+
+        async def chunks():
+            for i in range(0, len(text), 16):
+                yield SimpleNamespace(text=text[i:i + 16])
+
+        return chunks()
+
+
+class _FakeCaches:
+    def __init__(self):
+        self.entries: Dict[str, Any] = {}
+
+    async def create(self, *, model: str, config: Any = None):
+        name = f"cachedContents/fake-{uuid4().hex[:12]}"
+        self.entries[name] = config
+        return SimpleNamespace(name=name, model=model)
+
+    async def update(self, *, name: str, config: Any = None):
+        if name not in self.entries:
+            raise KeyError(name)
+        return SimpleNamespace(name=name)
+
+    async def delete(self, *, name: str):
+        self.entries.pop(name, None)
+
+
+class _FakeAio:
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self.models = _FakeModels(self.calls)
+        self.caches = _FakeCaches()
+
+    async def aclose(self):
+        pass
+
+
+class FakeGenaiClient:
+    """
+    Offline stand-in for genai.Client (GEMINI_CLIENT_MODE=fake).
+    Records every request and cached-content registration, and answers with an
+    empty report so analyse() exercises its per-service fallbacks without network access.
+    """
+
+    def __init__(self):
+        self.aio = _FakeAio()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Optional
+from google import genai
+from google.genai import types
+from app.core.config import settings
+from app.services.prompts import PROMPT_TEMPLATE, SYSTEM_INSTRUCTION
+
+
+class StaticContextCache:
+    """
+    Keeps the static part of the prompt (rules, expectations, JSON schema) registered
+    as a Gemini cached content, so each job only sends its own services and videos.
+
+    The registration is created lazily, its TTL is extended shortly before it expires,
+    and after a failed registration callers simply send the full prompt until the
+    retry delay has passed.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        ttl_seconds: int = settings.gemini_context_cache_ttl_seconds,
+        refresh_margin_seconds: int = settings.gemini_context_cache_refresh_seconds,
+        retry_delay_seconds: int = 300,
+    ):
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self._name: Optional[str] = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_name(self, client: genai.Client) -> Optional[str]:
+        """Returns the cached content name to use, or None to send the full prompt."""
+        now = time.monotonic()
+        if self._name and now < self._expires_at - self.refresh_margin_seconds:
+            return self._name
+
+        async with self._lock:
+            now = time.monotonic()
+            if self._name and now < self._expires_at - self.refresh_margin_seconds:
+                return self._name
+            if not self._name and now < self._retry_at:
+                return None
+
+            ttl = f"{self.ttl_seconds}s"
+            try:
+                if self._name:
+                    await client.aio.caches.update(
+                        name=self._name,
+                        config=types.UpdateCachedContentConfig(ttl=ttl),
+                    )
+                else:
+                    cached = await client.aio.caches.create(
+                        model=self.model,
+                        config=types.CreateCachedContentConfig(
+                            display_name=f"yt-recommender-prompt-v{PROMPT_TEMPLATE.version}",
+                            system_instruction=SYSTEM_INSTRUCTION,
+                            contents=[PROMPT_TEMPLATE.static_prefix],
+                            ttl=ttl,
+                        ),
+                    )
+                    self._name = cached.name
+                    print(f"Registered Gemini context cache {self._name}")
+                self._expires_at = now + self.ttl_seconds
+            except Exception as e:
+                print(f"Gemini context cache unavailable, sending full prompts: {str(e)}")
+                self._name = None
+                self._retry_at = now + self.retry_delay_seconds
+            return self._name
+
+    def invalidate(self):
+        """Forget the registration (e.g. after the API reports it missing)."""
+        self._name = None
+        self._expires_at = 0.0
+
+    async def release(self, client: genai.Client):
+        """Delete the registration on shutdown instead of waiting for its TTL."""
+        name, self._name = self._name, None
+        if name:
+            try:
+                await client.aio.caches.delete(name=name)
+            except Exception:
+                pass  # It expires on its own
@@ -0,0 +1,110 @@
+import asyncio
+from contextlib import ExitStack
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from app.core.config import settings
+from app.services.mongo_client import get_db, get_job, job_updates
+
+# None until the first attempt to open a change stream, False once the deployment
+# rejected it (standalone mongod) so later subscribers go straight to the fallback
+_change_streams_supported: Optional[bool] = None if settings.job_events_change_streams else False
+
+
+class JobEventStream:
+    """
+    Follows the updates of one job.
+
+    With a replica set the job is watched through a MongoDB change stream, so
+    updates made by any worker process are seen. Otherwise it listens to the
+    in-process job_updates feed published by update_job(), and checks the job's
+    status every few seconds to notice progress made by workers in other processes.
+
+    Usage:
+        async with JobEventStream(job_id) as events:
+            events.snapshot         # job document read after subscribing, None if missing
+            await events.next()     # {field path: new value}, or None on keepalive timeout
+    """
+
+    def __init__(self, job_id: str, keepalive_seconds: float = settings.job_events_keepalive_seconds):
+        self.job_id = job_id
+        self.keepalive_seconds = keepalive_seconds
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self._change_stream = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._exit_stack = ExitStack()
+        self._status: Optional[str] = None
+
+    async def __aenter__(self) -> "JobEventStream":
+        global _change_streams_supported
+        try:
+            oid = ObjectId(self.job_id)
+        except Exception:
+            return self  # No such job; snapshot stays None
+
+        # Subscribe before reading the snapshot so no update falls in between
+        if _change_streams_supported is not False:
+            change_stream = get_db().jobs.watch(
+                [{"$match": {"documentKey._id": oid, "operationType": {"$in": ["update", "replace"]}}}],
+                max_await_time_ms=int(self.keepalive_seconds * 1000),
+            )
+            try:
+                self._change_stream = await change_stream.__aenter__()
+                _change_streams_supported = True
+            except (OperationFailure, NotImplementedError) as e:
+                print(f"MongoDB change streams unavailable, using in-process job events: {str(e)}")
+                _change_streams_supported = False
+
+        if self._change_stream is None:
+            self._queue = self._exit_stack.enter_context(job_updates.subscribe(self.job_id))
+
+        self.snapshot = await get_job(self.job_id)
+        if self.snapshot:
+            self._status = self.snapshot.get("status")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._exit_stack.close()
+        if self._change_stream is not None:
+            await self._change_stream.close()
+            self._change_stream = None
+
+    async def next(self) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next update of the job and return the fields it changed, keyed by
+        their dotted path (e.g. "ai_report.services.copyright_protection").
+        Returns None when nothing changed within the keepalive interval.
+        """
+        if self._change_stream is not None:
+            change = await self._change_stream.try_next()
+            if change is None:
+                return None
+            if change["operationType"] == "replace":
+                changes = dict(change["fullDocument"])
+                changes.pop("_id", None)
+            else:
+                changes = change["updateDescription"]["updatedFields"]
+        else:
+            try:
+                changes = await asyncio.wait_for(self._queue.get(), timeout=self.keepalive_seconds)
+            except asyncio.TimeoutError:
+                changes = await self._check_status()
+                if changes is None:
+                    return None
+
+        self._status = changes.get("status", self._status)
+        return changes
+
+    async def _check_status(self) -> Optional[Dict[str, Any]]:
+        """
+        Fallback for workers running in other processes: a status-only read, followed
+        by a full read of the job (returned as its changed fields) when the status moved.
+        """
+        doc = await get_db().jobs.find_one({"_id": ObjectId(self.job_id)}, {"status": 1})
+        if not doc or doc.get("status") == self._status:
+            return None
+        job = await get_job(self.job_id)
+        if not job:
+            return None
+        job.pop("_id", None)
+        return job
@@ -1,7 +1,22 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, Dict, Any
+from pymongo import ReturnDocument
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timedelta
 from bson import ObjectId
 from app.core.config import settings
+from app.utils.pubsub import PubSub
+from app.services import user_cache
+
+# Job statuses that will never be picked up by a worker again
+TERMINAL_JOB_STATUSES = ("completed", "failed")
+
+# In-process feed of job updates (job ID -> $set fields), used to stream job
+# events when MongoDB change streams are not available
+job_updates = PubSub()
+
+# Fields never loaded with a user: job_ids is the unbounded array of earlier
+# versions, kept out until run_migrations() has removed it
+USER_PROJECTION = {"job_ids": 0}
 
 # Global MongoDB client (singleton)
 _client: Optional[AsyncIOMotorClient] = None
@@ -44,9 +59,20 @@ async def create_job(document: Dict[str, Any]) -> str:
     return str(result.inserted_id)
 
 
-async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+async def create_jobs(documents: List[Dict[str, Any]]) -> List[str]:
+    """
+    Inserts several job documents with a single insert_many.
+    Returns the inserted document IDs as strings, in the order of the documents.
+    """
+    db = get_db()
+    result = await db.jobs.insert_many(documents)
+    return [str(oid) for oid in result.inserted_ids]
+
+
+async def get_job(job_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     """
     Retrieves a job document by its ID.
+    An optional projection limits the fields loaded (e.g. {"status": 1}).
     Returns the document or None if not found.
     """
     db = get_db()
@@ -55,7 +81,7 @@ async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
     except Exception:
         return None
 
-    job = await db.jobs.find_one({"_id": oid})
+    job = await db.jobs.find_one({"_id": oid}, projection)
     if job:
         job["_id"] = str(job["_id"])
     return job
@@ -73,9 +99,120 @@ async def update_job(job_id: str, update_data: Dict[str, Any]) -> bool:
         return False
 
     result = await db.jobs.update_one({"_id": oid}, {"$set": update_data})
+    if result.modified_count > 0:
+        job_updates.publish(job_id, update_data)
     return result.modified_count > 0
 
 
+async def claim_next_job(worker_id: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claims the oldest runnable job for a worker.
+    A job is runnable when it is not finished and nobody holds a live lease on it,
+    so jobs left behind by a crashed worker are picked up again once their lease expires.
+    Returns the claimed job document or None if the queue is empty.
+    """
+    db = get_db()
+    now = datetime.utcnow()
+    job = await db.jobs.find_one_and_update(
+        {
+            "status": {"$nin": list(TERMINAL_JOB_STATUSES)},
+            "$or": [
+                {"lease_expires_at": None},
+                {"lease_expires_at": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        job["_id"] = str(job["_id"])
+    return job
+
+
+async def list_user_jobs(
+    email: str,
+    limit: int,
+    before: Optional[Tuple[datetime, str]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    A user's jobs, newest first, served by the (email, created_at, _id) index.
+    Keyset pagination: before is the (created_at, _id) of the last job of the
+    previous page. An optional projection limits the fields loaded.
+    """
+    db = get_db()
+    query: Dict[str, Any] = {"email": email}
+    if before is not None:
+        created_at, job_id = before
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": ObjectId(job_id)}},
+        ]
+    if projection is not None:
+        projection = {**projection, "created_at": 1}
+
+    cursor = db.jobs.find(query, projection).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+    jobs = []
+    async for job in cursor:
+        job["_id"] = str(job["_id"])
+        jobs.append(job)
+    return jobs
+
+
+async def get_batch_progress(batch_id: str) -> Dict[str, int]:
+    """
+    Counts the jobs of a batch by status, e.g. {"queued": 40, "completed": 10}.
+    Returns an empty dict for an unknown batch.
+    """
+    db = get_db()
+    cursor = db.jobs.aggregate([
+        {"$match": {"batch_id": batch_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ])
+    return {doc["_id"]: doc["count"] async for doc in cursor}
+
+
+async def get_batch_channel_names(batch_id: str) -> List[str]:
+    """
+    Returns the distinct channel names submitted in a batch.
+    """
+    db = get_db()
+    return await db.jobs.distinct("channel_name", {"batch_id": batch_id})
+
+
+async def renew_job_lease(job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    """
+    Extends the lease on a job held by the given worker (heartbeat).
+    Returns False if the worker no longer owns the job.
+    """
+    db = get_db()
+    result = await db.jobs.update_one(
+        {"_id": ObjectId(job_id), "lease_owner": worker_id},
+        {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+    )
+    return result.matched_count > 0
+
+
+async def release_job_lease(job_id: str, worker_id: str) -> bool:
+    """
+    Drops the worker's lease on a job once it has finished processing it.
+    """
+    db = get_db()
+    result = await db.jobs.update_one(
+        {"_id": ObjectId(job_id), "lease_owner": worker_id},
+        {"$set": {"lease_owner": None, "lease_expires_at": None}},
+    )
+    return result.matched_count > 0
+
+
 async def close_client():
     """
     Closes the MongoDB client connection.
@@ -103,7 +240,7 @@ async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     Returns user document or None
     """
     db = get_db()
-    user = await db.users.find_one({"email": email})
+    user = await db.users.find_one({"email": email}, USER_PROJECTION)
     if user:
         user["_id"] = str(user["_id"])
     return user
@@ -115,7 +252,7 @@ async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
     Returns user document or None
     """
     db = get_db()
-    user = await db.users.find_one({"username": username})
+    user = await db.users.find_one({"username": username}, USER_PROJECTION)
     if user:
         user["_id"] = str(user["_id"])
     return user
@@ -123,14 +260,20 @@ async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
 
 async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
-    Get user by ID
+    Get user by ID, served from the in-process user cache when possible
     Returns user document or None
     """
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
     db = get_db()
     try:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        read_generation = user_cache.generation()
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
         if user:
             user["_id"] = str(user["_id"])
+            user_cache.put(user_id, user, read_generation)
         return user
     except Exception:
         return None
@@ -158,6 +301,78 @@ async def update_user(user_id: str, update_data: Dict[str, Any]) -> bool:
         return result.modified_count > 0
     except Exception:
         return False
+    finally:
+        # After the write, so a concurrent read of the old document is not cached
+        user_cache.invalidate(user_id)
+
+
+async def update_user_by_email(email: str, update_data: Dict[str, Any]) -> bool:
+    """
+    Apply MongoDB update operators ($inc, $push, ...) to the user with this email
+    in one round trip, without loading the user first.
+    Returns True if a user was updated
+    """
+    db = get_db()
+    try:
+        user = await db.users.find_one_and_update({"email": email}, update_data, projection={"_id": 1})
+    except Exception:
+        return False
+    if user is None:
+        return False
+    user_cache.invalidate(str(user["_id"]))
+    return True
+
+
+async def reserve_credits(user_id: str, credits: int, jobs: int) -> Optional[Dict[str, Any]]:
+    """
+    Atomically charge credits to a user, only if they stay within credits_limit,
+    and count the submitted jobs in the same update.
+    Returns {"_id", "plan"} of the user, or None if the user is unknown or lacks credits.
+    """
+    db = get_db()
+    user = await db.users.find_one_and_update(
+        {
+            "_id": ObjectId(user_id),
+            "$expr": {"$lte": [{"$add": [{"$ifNull": ["$credits_used", 0]}, credits]}, {"$ifNull": ["$credits_limit", 100]}]},
+        },
+        {"$inc": {"credits_used": credits, "total_jobs": jobs, "active_jobs": jobs}},
+        projection={"_id": 1, "plan": 1},
+    )
+    if user is None:
+        return None
+    user["_id"] = str(user["_id"])
+    user_cache.invalidate(user["_id"])
+    return user
+
+
+async def refund_credits(user_id: str, credits: int, jobs: int) -> bool:
+    """
+    Give back credits reserved for jobs that were never created.
+    Returns True if the user was updated
+    """
+    return await update_user(user_id, {"$inc": {"credits_used": -credits, "total_jobs": -jobs, "active_jobs": -jobs}})
+
+
+async def refund_job_credits(job_id: str) -> int:
+    """
+    Give back the credits reserved by a failed job, at most once per job.
+    Returns the number of credits refunded.
+    """
+    db = get_db()
+    job = await db.jobs.find_one_and_update(
+        {"_id": ObjectId(job_id), "credits_reserved": {"$gt": 0}},
+        {"$set": {"credits_reserved": 0}},
+        projection={"user_id": 1, "email": 1, "credits_reserved": 1},
+    )
+    if job is None:
+        return 0
+    refund = {"$inc": {"credits_used": -job["credits_reserved"]}}
+    if job.get("user_id"):
+        await update_user(job["user_id"], refund)
+    else:
+        # Jobs queued before the submitting user's ID was stored on them
+        await update_user_by_email(job["email"], refund)
+    return job["credits_reserved"]
 
 
 async def delete_user(user_id: str) -> bool:
@@ -171,3 +386,5 @@ async def delete_user(user_id: str) -> bool:
         return result.deleted_count > 0
     except Exception:
         return False
+    finally:
+        user_cache.invalidate(user_id)
@@ -0,0 +1,361 @@
+from typing import List, Dict, Any, Tuple
+
+# Bump whenever the prompt text changes so cached analyses are not reused across versions
+PROMPT_TEMPLATE_VERSION = "2"
+
+SYSTEM_INSTRUCTION = "You are an expert YouTube content strategist. Always respond with valid JSON only."
+
+# Opening lines of every prompt
+_HEADER = """
+You are an AI-powered YouTube Intelligence Suite used by professional creators and growth teams.
+
+You do NOT give generic advice.
+You produce EXECUTABLE INSIGHTS that can be shown directly in a product dashboard.
+"""
+
+# Rules, expectations and the output schema; identical for every job
+_STATIC_SECTIONS = """
+===========================
+SERVICE EXECUTION RULES
+===========================
+- Execute ONLY the services explicitly requested
+- Do NOT include services that were not requested
+- Each service must be clearly separated in the output
+- Every score, rating, or risk level MUST include reasoning
+- Avoid vague phrases like "could be improved" or "might work"
+- Be decisive, confident, and specific
+
+===========================
+SERVICE-SPECIFIC EXPECTATIONS
+===========================
+
+SEMANTIC TITLE ENGINE
+- Titles must be platform-native (YouTube style)
+- Use curiosity gaps, specificity, emotional triggers
+- Avoid clickbait without payoff
+- Clearly explain WHY each alternative works better
+- Ratings must reflect realistic CTR potential
+
+PREDICTIVE CTR ANALYSIS
+- Scores must reflect title + thumbnail psychology
+- Highlight concrete weaknesses (length, clarity, emotion, promise)
+- Recommend specific changes (words, numbers, framing)
+- Assume creator wants maximum clicks without misleading viewers
+
+MULTI-PLATFORM MASTERY
+- Do NOT repeat the same advice across platforms
+- Respect platform-native behavior (scroll speed, hook time)
+- Suggest concrete adaptations, not reposting
+- Optimize for algorithmic discovery, not followers
+
+COPYRIGHT PROTECTION
+- Be conservative and risk-aware
+- Flag even borderline risks
+- Assume Content ID systems, not manual review
+- Provide safe, creator-friendly alternatives
+
+FAIR USE ANALYSIS
+- Assess transformation, not intent
+- Consider education, commentary, critique
+- Be explicit about risk boundaries
+- Provide actionable legal safety guidance (not legal disclaimers)
+
+TREND INTELLIGENCE
+- Focus on EARLY signals, not obvious trends
+- Avoid generic topics everyone already covers
+- Prioritize actionable next-video ideas
+- Think in a 24-72 hour opportunity window
+
+===========================
+OUTPUT FORMAT (STRICT)
+===========================
+Return VALID JSON ONLY.
+No markdown. No explanations outside JSON.
+
+CRITICAL: Follow this EXACT schema. Do not add, remove, or rename fields.
+Use the exact field names shown below (case-sensitive, with underscores).
+
+JSON STRUCTURE:
+{
+  "services": {
+    "semantic_title_engine": {
+      "channel_analysis": {
+        "overall_assessment": "string - detailed channel title strategy analysis"
+      },
+      "suggestions": [
+        {
+          "original_title": "string - exact current title",
+          "current_issues": ["string issue 1", "string issue 2", "string issue 3"],
+          "alternative_titles": [
+            {
+              "new_suggested_title": "string - alternative title",
+              "ctr_potential_rating": 8,
+              "why_it_s_effective": "string - psychology explanation"
+            },
+            {
+              "new_suggested_title": "string - alternative title 2",
+              "ctr_potential_rating": 7,
+              "why_it_s_effective": "string - psychology explanation"
+            },
+            {
+              "new_suggested_title": "string - alternative title 3",
+              "ctr_potential_rating": 9,
+              "why_it_s_effective": "string - psychology explanation"
+            }
+          ]
+        }
+      ],
+      "growth_tips": ["string tip 1", "string tip 2", "string tip 3"]
+    },
+    
+    "predictive_ctr_analysis": {
+      "score": 5.5,
+      "reasoning": "string - explanation of score",
+      "comparison_to_industry_average": "string - industry comparison",
+      "what_is_working_or_missing": {
+        "working": "string paragraph - what's working well",
+        "missing": "string paragraph - what's missing"
+      },
+      "recommendations": ["string rec 1", "string rec 2", "string rec 3"],
+      "potential_increase": "30-50%",
+      "psychological_triggers_to_boost_engagement": ["string trigger 1", "string trigger 2"]
+    },
+    
+    "multi_platform_mastery": {
+      "platforms": {
+        "youtube": {
+          "score": 9,
+          "reasoning": "string - why this score",
+          "strategy": "string - platform-specific strategy",
+          "optimization_tips": ["string tip 1", "string tip 2"]
+        },
+        "x_twitter": {
+          "score": 6,
+          "reasoning": "string - why this score",
+          "strategy": "string - platform-specific strategy",
+          "optimization_tips": ["string tip 1", "string tip 2"]
+        },
+        "linkedin": {
+          "score": 7,
+          "reasoning": "string - why this score",
+          "strategy": "string - platform-specific strategy",
+          "optimization_tips": ["string tip 1", "string tip 2"]
+        }
+      }
+    },
+    
+    "copyright_protection": {
+      "risk_level": "LOW",
+      "flags": ["string flag 1", "string flag 2"],
+      "assessment": "string - detailed assessment",
+      "recommendations": ["string rec 1", "string rec 2"]
+    },
+    
+    "fair_use_analysis": {
+      "score": 90,
+      "reasoning": "string - explanation of score",
+      "assessment": "string - detailed fair use assessment",
+      "fair_use_factors_breakdown": {
+        "purpose_and_character": {
+          "score": 9,
+          "reasoning": "string - explanation"
+        },
+        "nature_of_work": {
+          "score": 8,
+          "reasoning": "string - explanation"
+        },
+        "amount_used": {
+          "score": 7,
+          "reasoning": "string - explanation"
+        },
+        "market_effect": {
+          "score": 9,
+          "reasoning": "string - explanation"
+        }
+      },
+      "recommendation_for_legal_safety": "string - actionable legal guidance"
+    },
+    
+    "trend_intelligence": {
+      "trending_topics": [
+        {
+          "name": "string - topic name",
+          "growth_percentage": "12%",
+          "relevance_rating": 9,
+          "reasoning": "string - why relevant"
+        }
+      ],
+      "predictions": ["string prediction 1", "string prediction 2"],
+      "actionable_content_ideas": ["string idea 1", "string idea 2"]
+    }
+  }
+}
+
+FIELD NAME RULES:
+- Use snake_case (underscores): "channel_analysis", "current_issues", "why_it_s_effective"
+- NOT camelCase: "channelAnalysis", "currentIssues", "whyItsEffective"
+- risk_level values: "LOW", "MEDIUM", or "HIGH" (uppercase)
+- Scores are numbers (not strings): 5.5, 90, 8
+- Arrays must contain strings or objects as shown above
+"""
+
+_FOOTER = """
+Remember:
+- Include ONLY requested services
+- Be concise, concrete, and product-ready
+"""
+
+_NO_SERVICES_INSTRUCTIONS = "Provide a general channel overview and basic recommendations."
+
+# Per-service instruction blocks, keyed by service ID
+SERVICE_PROMPTS = {
+    "1": """1. SEMANTIC TITLE ENGINE (LLM-Driven Headline Generation):
+   
+   For EACH VIDEO, provide:
+   - **Channel Analysis**: Overall assessment of the channel's title strategy, content themes, and approach
+   - **Original Title**: State the current title exactly as it appears
+   - **Current Issues**: List 2-4 specific problems with the title (use bullet points)
+   - **3 Alternative Titles**: Each with:
+ * The new suggested title
+ * CTR Potential rating (0-10 scale)
+ * "Why It's Effective": Explain the psychology (curiosity gap, power words, emotional triggers, etc.)
+   - **Growth Tips**: 3-5 actionable recommendations for improving the channel's overall title strategy
+   
+   CRITICAL RULES:
+   - Be HIGHLY specific about what's wrong with current titles
+   - Make alternatives DRASTICALLY different from originals
+   - Focus on CTR psychology: curiosity gaps, specificity, emotional triggers, power words
+   - Avoid generic advice - give concrete, implementable suggestions
+   - Growth tips should be unique to this channel's niche and style""",
+    
+    "2": """2. PREDICTIVE CTR ANALYSIS (Thumbnail Saliency Mapping):
+   - Estimate overall channel CTR (0-100%)
+   - Compare to industry average
+   - Identify what's working or missing in titles/thumbnails
+   - Provide 4-6 specific, actionable recommendations to improve click-through rates
+   - Include "Potential Increase" estimate with optimizations
+   - Highlight psychological triggers that could boost engagement""",
+    
+    "3": """3. MULTI-PLATFORM MASTERY (Cross-Platform Algorithm Alignment):
+   - Analyze how this content would perform on:
+ * YouTube (long-form, algorithm preferences)
+ * X / Twitter (short-form threads, viral hooks)
+ * LinkedIn (professional networking, thought leadership)
+   - For EACH platform provide:
+ * Score (0-10)
+ * Strategy (specific to that platform's algorithm)
+ * Optimization tips (concrete actions)
+   - Do NOT repeat the same advice across platforms
+   - Suggest content adaptations, not just reposting""",
+    
+    "7": """4. COPYRIGHT PROTECTION (Content ID Scanning Pre-Upload):
+   
+   IMPORTANT: Only flag ACTUAL copyright issues:
+   - Background music from copyrighted sources
+   - Clips from other creators' videos
+   - Copyrighted images, logos, or graphics
+   - Brand names used commercially
+   
+   DO NOT FLAG:
+   - Educational content about technical topics
+   - Original creator commentary
+   - Tutorial/educational video content
+   - Technical terms or concepts
+   
+   Provide:
+   - Risk Level: LOW, MEDIUM, or HIGH (be conservative - most educational content is LOW)
+   - Flags: List ONLY actual copyrighted material detected
+   - Assessment: Brief explanation
+   - Recommendations: Safe alternatives if risks found""",
+    
+    "8": """5. FAIR USE ANALYSIS (Transformative Content Assessment):
+   - Evaluate transformativeness of the content (0-100 score)
+   - Assess commentary, criticism, or educational value
+   - Break down fair use factors:
+ * Purpose (educational/commentary)
+ * Nature (factual/creative)
+ * Amount used
+ * Market effect
+   - Provide clear recommendation for legal safety""",
+    
+    "10": """6. TREND INTELLIGENCE (48-Hour Early Trend Detection):
+   - Identify 3-5 trending topics related to this channel's niche
+   - For each topic: name, growth percentage, relevance rating
+   - Provide 3-5 specific predictions for the next 24-72 hours
+   - Suggest 3-5 actionable content ideas aligned with emerging trends
+   - Focus on EARLY signals, not obvious trends everyone already covers"""
+}
+
+
+class PromptTemplate:
+    """
+    Gemini prompt compiled once per template version.
+
+    The static instructions are assembled into static_prefix when the template is
+    created (and can be registered as cached context), per-service blocks are
+    pre-rendered, and each job only splices in its service list and video data.
+    """
+
+    def __init__(self, version: str, service_prompts: Dict[str, str]):
+        self.version = version
+        self.static_prefix = _HEADER + "\n" + _STATIC_SECTIONS
+        self._service_blocks = {
+            service_id: text + "\n\n"
+            for service_id, text in service_prompts.items()
+        }
+        self._instructions: Dict[Tuple[str, ...], str] = {}
+
+    def service_instructions(self, services: List[str]) -> str:
+        """Instructions for the selected services, memoized per service combination."""
+        key = tuple(services)
+        instructions = self._instructions.get(key)
+        if instructions is None:
+            blocks = [self._service_blocks[sid] for sid in services if sid in self._service_blocks]
+            if blocks:
+                instructions = "PERFORM THE FOLLOWING ANALYSES:\n\n" + "".join(blocks)
+            else:
+                # If no services selected, do basic analysis
+                instructions = _NO_SERVICES_INSTRUCTIONS
+            self._instructions[key] = instructions
+        return instructions
+
+    @staticmethod
+    def video_section(videos: List[Dict[str, Any]]) -> str:
+        return "\n".join(
+            f"""
+VIDEO {i + 1}:
+- Title: "{v.get('title', 'N/A')}"
+- Description: {(v.get('description') or 'N/A')[:200]}...
+- Views: {v.get('statistics', {}).get('viewCount', 'N/A')}
+- Likes: {v.get('statistics', {}).get('likeCount', 'N/A')}
+- Comments: {v.get('statistics', {}).get('commentCount', 'N/A')}
+"""
+            for i, v in enumerate(videos)
+        )
+
+    def render_dynamic(self, videos: List[Dict[str, Any]], services: List[str]) -> str:
+        """The per-job part of the prompt: requested services and channel video data."""
+        return (
+            "\n===========================\n"
+            "REQUESTED SERVICES\n"
+            "===========================\n"
+            + self.service_instructions(services)
+            + "\n\n===========================\n"
+            "CHANNEL VIDEO DATA\n"
+            "===========================\n"
+            + self.video_section(videos)
+            + _FOOTER
+        )
+
+    def render(self, videos: List[Dict[str, Any]], services: List[str]) -> str:
+        """The full prompt: static prefix followed by the per-job part."""
+        return self.static_prefix + self.render_dynamic(videos, services)
+
+
+# Current prompt template
+PROMPT_TEMPLATE = PromptTemplate(PROMPT_TEMPLATE_VERSION, SERVICE_PROMPTS)
+
+
+def build_service_instructions(services: List[str]) -> str:
+    """Build prompt instructions based on selected services."""
+    return PROMPT_TEMPLATE.service_instructions(services)
@@ -0,0 +1,188 @@
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.core.config import settings
+from app.services.mongo_client import get_db
+from app.models.models import QUOTA_LEDGER_COLLECTION, JOB_COLLECTION
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:  # tzdata missing (e.g. Windows without the tzdata package)
+    _QUOTA_TZ = timezone(timedelta(hours=-8))
+
+# Documented YouTube Data API v3 cost per call, keyed by endpoint path
+QUOTA_COSTS: Dict[str, int] = {
+    "/search": 100,
+    "/channels": 1,
+    "/playlistItems": 1,
+    "/videos": 1,
+}
+
+# Uploads listed per /playlistItems page, each page also needing one /videos call
+VIDEOS_PER_PAGE = 50
+
+
+def job_quota_cost(max_videos: int, resolve_endpoints: Tuple[str, ...] = ()) -> int:
+    """
+    Worst-case YouTube cost of a job fetching max_videos uploads: the calls that
+    resolve its channel (e.g. /search), the /channels uploads playlist lookup and
+    one /playlistItems plus one /videos call per page.
+    """
+    pages = max(math.ceil(max_videos / VIDEOS_PER_PAGE), 1)
+    page_cost = QUOTA_COSTS["/playlistItems"] + QUOTA_COSTS["/videos"]
+    return sum(QUOTA_COSTS[endpoint] for endpoint in resolve_endpoints) + QUOTA_COSTS["/channels"] + pages * page_cost
+
+
+# Worst-case YouTube cost of one job, whose channel resolves through /search
+JOB_COST_WITH_SEARCH = job_quota_cost(settings.job_max_videos, ("/search",))
+# A job whose channel ID is already known
+JOB_COST_WITHOUT_SEARCH = job_quota_cost(settings.job_max_videos)
+# A job for an @handle, resolved with one /channels call
+JOB_COST_FOR_HANDLE = job_quota_cost(settings.job_max_videos, ("/channels",))
+
+
+class QuotaExceededError(Exception):
+    """Raised when a call would exceed the daily YouTube Data API quota."""
+
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    """YouTube quotas reset at midnight Pacific Time; returns the current quota day."""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(_QUOTA_TZ).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset() -> int:
+    """Seconds until the next Pacific midnight."""
+    now = datetime.now(timezone.utc).astimezone(_QUOTA_TZ)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int((tomorrow - now).total_seconds()) + 1
+
+
+async def charge_quota(endpoint: str) -> int:
+    """
+    Atomically charges the cost of one call to today's ledger document.
+    Raises QuotaExceededError instead of charging when the daily limit would be exceeded.
+    Returns the units used today after the charge.
+    """
+    cost = QUOTA_COSTS.get(endpoint, 1)
+    limit = settings.youtube_daily_quota
+    ledger = get_db()[QUOTA_LEDGER_COLLECTION]
+    try:
+        doc = await ledger.find_one_and_update(
+            {"_id": quota_day(), "used": {"$lte": limit - cost}},
+            {
+                "$inc": {"used": cost, f"endpoints.{endpoint.strip('/')}": cost},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Today's document exists but the filter failed, so the charge would exceed the limit
+        raise QuotaExceededError(f"Daily YouTube quota of {limit} units exhausted")
+    return doc["used"]
+
+
+async def get_quota_usage() -> int:
+    """Units charged so far in the current quota day."""
+    doc = await get_db()[QUOTA_LEDGER_COLLECTION].find_one({"_id": quota_day()})
+    return doc.get("used", 0) if doc else 0
+
+
+async def get_pending_quota() -> int:
+    """
+    Sum of the projected quota cost of every job that has not started yet.
+    Jobs a worker has claimed already charge the ledger as they make their calls,
+    so counting them here as well would count their usage twice.
+    """
+    cursor = get_db()[JOB_COLLECTION].aggregate([
+        {"$match": {"status": "queued", "lease_owner": None}},
+        {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$quota_estimate", JOB_COST_WITH_SEARCH]}}}},
+    ])
+    result = await cursor.to_list(length=1)
+    return result[0]["total"] if result else 0
+
+
+async def has_quota_for(estimate: int) -> bool:
+    """
+    Admission check: True if today's usage, the estimate of every job waiting in
+    the queue and this new job still fit in the daily quota.
+    """
+    used, pending = await asyncio.gather(get_quota_usage(), get_pending_quota())
+    return used + pending + estimate <= settings.youtube_daily_quota
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter. One instance is shared by every worker
+    in the process so the pool as a whole stays under the configured rate.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until the requested number of tokens is available and take them."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class SharedTokenBucket:
+    """
+    Token bucket shared by every API and worker process through one document in
+    the quota ledger collection, kept as a generic cell rate algorithm: the document
+    holds the time at which the bucket is full again, each acquire pushes it forward
+    atomically and then sleeps until its turn. One round trip per acquire, with no
+    retries under contention. Host clocks are assumed to be in sync (NTP).
+    Falls back to a per-process TokenBucket while MongoDB is unreachable.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self._local = TokenBucket(rate, capacity)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until the requested number of tokens is available and take them."""
+        now = time.time()
+        try:
+            doc = await get_db()[QUOTA_LEDGER_COLLECTION].find_one_and_update(
+                {"_id": self.key},
+                [{"$set": {"full_at": {"$add": [{"$max": [{"$ifNull": ["$full_at", now]}, now]}, tokens / self.rate]}}}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except PyMongoError as e:
+            print(f"Shared YouTube rate limiter unavailable, limiting per process: {str(e)}")
+            await self._local.acquire(tokens)
+            return
+        wait = doc["full_at"] - self.capacity / self.rate - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# YouTube API rate limiter shared by all processes
+youtube_rate_limiter = SharedTokenBucket(
+    "youtube_rate_limiter",
+    rate=settings.youtube_requests_per_second,
+    capacity=settings.youtube_request_burst,
+)
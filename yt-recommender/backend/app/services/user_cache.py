@@ -0,0 +1,35 @@
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+# User ID -> user document, for the authenticated-user lookup done on every request.
+# Writes in this process invalidate entries explicitly; writes made by other
+# processes become visible once the (short) TTL has passed.
+_users = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+# Bumped on every invalidation so a read that raced with a write is not cached
+_generation = 0
+
+
+def generation() -> int:
+    """Take before reading a user from MongoDB and pass to put() afterwards."""
+    return _generation
+
+
+def get(user_id: str) -> Optional[Dict[str, Any]]:
+    """Cached user document (a copy callers may modify), or None."""
+    user = _users.get(user_id)
+    return dict(user) if user is not None else None
+
+
+def put(user_id: str, user: Dict[str, Any], read_generation: int):
+    """Cache a user document unless an invalidation happened since it was read."""
+    if read_generation == _generation:
+        _users.set(user_id, dict(user))
+
+
+def invalidate(user_id: str):
+    """Drop a user after it was updated or deleted."""
+    global _generation
+    _generation += 1
+    _users.pop(user_id)
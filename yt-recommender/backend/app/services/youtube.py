@@ -1,9 +1,51 @@
+import re
+import asyncio
 import httpx
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from typing import List, Dict, Any, Optional, Set, AsyncIterator
 from app.core.config import settings
+from app.services.mongo_client import get_db
+from app.services.quota import (
+    charge_quota,
+    youtube_rate_limiter,
+    JOB_COST_WITH_SEARCH,
+    JOB_COST_WITHOUT_SEARCH,
+    JOB_COST_FOR_HANDLE,
+)
+from app.models.models import CHANNEL_CACHE_COLLECTION, UPLOADS_PLAYLIST_COLLECTION, RESPONSE_CACHE_COLLECTION
+from app.utils.cache import TTLCache
 
 BASE_URL = "https://www.googleapis.com/youtube/v3"
 
+# Raw channel IDs are "UC" followed by 22 URL-safe base64 characters
+CHANNEL_ID_RE = re.compile(r"^UC[A-Za-z0-9_-]{22}$")
+CHANNEL_URL_RE = re.compile(r"(?:https?://)?(?:www\.|m\.)?youtube\.com/(?:channel/(UC[A-Za-z0-9_-]{22})|(@[^/?#\s]+))", re.IGNORECASE)
+
+# In-process tier of the channel resolution cache (normalized query -> channel ID)
+_channel_cache = TTLCache(
+    maxsize=settings.channel_cache_size,
+    ttl=settings.channel_cache_memory_ttl_seconds,
+)
+
+# Uploads playlist IDs never change for a channel, so they are cached permanently
+_uploads_playlists: Dict[str, str] = {}
+
+# In-process tier of the conditional response cache (request key -> etag/body/fetched_at)
+_response_cache = TTLCache(
+    maxsize=settings.response_cache_size,
+    ttl=settings.response_cache_ttl_seconds,
+)
+
+# Per-video statistics, kept for the statistics freshness window
+_statistics_cache = TTLCache(
+    maxsize=settings.response_cache_size * 10,
+    ttl=settings.statistics_freshness_seconds,
+)
+
+# The Data API accepts at most 50 IDs per /videos request
+MAX_IDS_PER_REQUEST = 50
+
 # Shared HTTP client (singleton)
 _client: Optional[httpx.AsyncClient] = None
 
@@ -18,21 +60,108 @@ def get_http_client() -> httpx.AsyncClient:
     return _client
 
 
+async def api_get(path: str, params: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """
+    Every YouTube Data API call goes through here: it waits on the shared rate
+    limiter and charges the endpoint's cost to the daily quota ledger first.
+    """
+    await youtube_rate_limiter.acquire()
+    await charge_quota(path)
+    client = get_http_client()
+    return await client.get(
+        path,
+        params={**params, "key": settings.youtube_api_key},
+        headers=headers,
+    )
+
+
+def normalize_channel_query(channel_query: str) -> str:
+    """
+    Normalizes user input into a stable cache key.
+    Channel URLs are reduced to their ID or @handle, raw channel IDs keep their case,
+    handles and free-text queries are lower-cased with whitespace collapsed.
+    """
+    query = channel_query.strip()
+
+    match = CHANNEL_URL_RE.search(query)
+    if match:
+        query = match.group(1) or match.group(2)
+
+    if CHANNEL_ID_RE.match(query):
+        return query
+
+    return " ".join(query.lower().split())
+
+
 async def resolve_channel(channel_query: str) -> str:
     """
     Resolves a channel name / handle / query to a channel ID.
+    Raw channel IDs pass straight through and @handles use /channels?forHandle= (1 quota unit);
+    only free-text queries fall back to /search (100 quota units).
+    Results are cached in memory and in MongoDB.
     """
-    client = get_http_client()
+    key = normalize_channel_query(channel_query)
+    if CHANNEL_ID_RE.match(key):
+        return key
+
+    channel_id = _channel_cache.get(key)
+    if channel_id:
+        return channel_id
+
+    channel_id = await _get_cached_channel_id(key)
+    if not channel_id:
+        if key.startswith("@"):
+            channel_id = await _resolve_handle(key)
+        else:
+            channel_id = await _search_channel(key)
+        await _store_channel_id(key, channel_id)
+
+    _channel_cache.set(key, channel_id)
+    return channel_id
+
 
+def estimate_job_quota(channel_query: str) -> int:
+    """
+    Projected YouTube quota cost of a job, used for admission control.
+    Only queries that will need /search are charged the expensive estimate; every
+    job is charged for the pages of settings.job_max_videos uploads.
+    """
+    key = normalize_channel_query(channel_query)
+    if CHANNEL_ID_RE.match(key) or key in _channel_cache:
+        return JOB_COST_WITHOUT_SEARCH
+    if key.startswith("@"):
+        return JOB_COST_FOR_HANDLE
+    return JOB_COST_WITH_SEARCH
+
+
+async def _resolve_handle(handle: str) -> str:
+    """Resolve an @handle to a channel ID without using search."""
+    resp = await api_get(
+        "/channels",
+        params={
+            "part": "id",
+            "forHandle": handle,
+        },
+    )
+    resp.raise_for_status()
+    data = resp.json()
+
+    if not data.get("items"):
+        raise ValueError("Channel not found")
+
+    return data["items"][0]["id"]
+
+
+async def _search_channel(channel_query: str) -> str:
+    """Resolve a free-text query to a channel ID through /search."""
     params = {
         "part": "snippet",
         "q": channel_query,
         "type": "channel",
         "maxResults": 1,
-        "key": settings.youtube_api_key,
     }
 
-    resp = await client.get("/search", params=params)
+    resp = await api_get("/search", params=params)
     resp.raise_for_status()
     data = resp.json()
 
@@ -42,81 +171,376 @@ async def resolve_channel(channel_query: str) -> str:
     return data["items"][0]["snippet"]["channelId"]
 
 
-async def fetch_latest_videos(
-    channel_id: str,
-    max_results: int = 10
-) -> List[Dict[str, Any]]:
+async def _get_cached_channel_id(key: str) -> Optional[str]:
+    """Look up a resolved channel in the MongoDB cache tier."""
+    try:
+        doc = await get_db()[CHANNEL_CACHE_COLLECTION].find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}}
+        )
+    except Exception as e:
+        print(f"Channel cache lookup failed: {str(e)}")
+        return None
+    return doc["channel_id"] if doc else None
+
+
+async def _store_channel_id(key: str, channel_id: str):
+    """Persist a resolved channel; MongoDB removes it through the TTL index on expires_at."""
+    collection = get_db()[CHANNEL_CACHE_COLLECTION]
+    try:
+        await collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "channel_id": channel_id,
+                "expires_at": datetime.utcnow() + timedelta(seconds=settings.channel_cache_ttl_seconds),
+            }},
+            upsert=True,
+        )
+    except Exception as e:
+        print(f"Channel cache write failed: {str(e)}")
+
+
+async def get_uploads_playlist(channel_id: str) -> str:
     """
-    Fetch latest videos with statistics for a channel.
+    Returns the uploads playlist ID of a channel.
+    Cached permanently in memory and in MongoDB since it never changes.
     """
-    client = get_http_client()
+    playlist_id = _uploads_playlists.get(channel_id)
+    if playlist_id:
+        return playlist_id
 
-    # Get uploads playlist
-    resp = await client.get(
-        "/channels",
-        params={
-            "part": "contentDetails",
-            "id": channel_id,
-            "key": settings.youtube_api_key,
-        },
-    )
-    resp.raise_for_status()
-    data = resp.json()
+    collection = get_db()[UPLOADS_PLAYLIST_COLLECTION]
+    try:
+        doc = await collection.find_one({"_id": channel_id})
+    except Exception as e:
+        print(f"Uploads playlist cache lookup failed: {str(e)}")
+        doc = None
 
-    uploads_playlist = data["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+    if doc:
+        playlist_id = doc["uploads_playlist"]
+    else:
+        resp = await api_get(
+            "/channels",
+            params={
+                "part": "contentDetails",
+                "id": channel_id,
+            },
+        )
+        resp.raise_for_status()
+        data = resp.json()
 
-    # Get playlist videos
-    resp = await client.get(
-        "/playlistItems",
-        params={
-            "part": "snippet,contentDetails",
-            "playlistId": uploads_playlist,
-            "maxResults": max_results,
-            "key": settings.youtube_api_key,
-        },
-    )
-    resp.raise_for_status()
-    items = resp.json().get("items", [])
+        if not data.get("items"):
+            raise ValueError("Channel not found")
 
-    video_ids = [
-        item["contentDetails"]["videoId"]
-        for item in items
-    ]
+        playlist_id = data["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        try:
+            await collection.update_one(
+                {"_id": channel_id},
+                {"$set": {"uploads_playlist": playlist_id}},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"Uploads playlist cache write failed: {str(e)}")
 
-    if not video_ids:
-        return []
+    _uploads_playlists[channel_id] = playlist_id
+    return playlist_id
 
-    # Fetch video statistics
-    resp = await client.get(
-        "/videos",
-        params={
-            "part": "statistics",
-            "id": ",".join(video_ids),
-            "key": settings.youtube_api_key,
-        },
-    )
-    resp.raise_for_status()
-    stats_map = {
-        v["id"]: v["statistics"]
-        for v in resp.json().get("items", [])
+
+async def prefetch_channels(channel_queries: List[str]):
+    """
+    Warm the channel caches for many channels at once (the jobs of a batch).
+
+    Resolutions already in MongoDB are loaded with one query, and the uploads
+    playlists of every known channel are loaded with one query plus one /channels
+    request per 50 uncached channels, instead of one lookup and one request per job.
+    Channels that still need /search or a handle lookup are resolved by their own job.
+    Best effort: failures are logged and left to the jobs.
+    """
+    channel_ids: Set[str] = set()
+    unresolved = []
+    for key in dict.fromkeys(normalize_channel_query(q) for q in channel_queries):
+        channel_id = key if CHANNEL_ID_RE.match(key) else _channel_cache.get(key)
+        if channel_id:
+            channel_ids.add(channel_id)
+        else:
+            unresolved.append(key)
+
+    try:
+        if unresolved:
+            cursor = get_db()[CHANNEL_CACHE_COLLECTION].find(
+                {"_id": {"$in": unresolved}, "expires_at": {"$gt": datetime.utcnow()}}
+            )
+            async for doc in cursor:
+                _channel_cache.set(doc["_id"], doc["channel_id"])
+                channel_ids.add(doc["channel_id"])
+
+        await _prefetch_uploads_playlists([cid for cid in channel_ids if cid not in _uploads_playlists])
+    except Exception as e:
+        print(f"Channel prefetch failed: {str(e)}")
+
+
+async def _prefetch_uploads_playlists(channel_ids: List[str]):
+    """Load the uploads playlists of several channels from MongoDB, then /channels in chunks of 50."""
+    if not channel_ids:
+        return
+    collection = get_db()[UPLOADS_PLAYLIST_COLLECTION]
+    async for doc in collection.find({"_id": {"$in": channel_ids}}):
+        _uploads_playlists[doc["_id"]] = doc["uploads_playlist"]
+
+    missing = [cid for cid in channel_ids if cid not in _uploads_playlists]
+    for i in range(0, len(missing), MAX_IDS_PER_REQUEST):
+        resp = await api_get(
+            "/channels",
+            params={
+                "part": "contentDetails",
+                "id": ",".join(missing[i:i + MAX_IDS_PER_REQUEST]),
+                "maxResults": MAX_IDS_PER_REQUEST,
+            },
+        )
+        resp.raise_for_status()
+        fetched = {
+            item["id"]: item["contentDetails"]["relatedPlaylists"]["uploads"]
+            for item in resp.json().get("items", [])
+        }
+        if not fetched:
+            continue
+        _uploads_playlists.update(fetched)
+        await collection.bulk_write(
+            [UpdateOne({"_id": cid}, {"$set": {"uploads_playlist": pid}}, upsert=True) for cid, pid in fetched.items()],
+            ordered=False,
+        )
+
+
+async def conditional_get(path: str, params: Dict[str, Any], freshness_seconds: int) -> Dict[str, Any]:
+    """
+    GET a YouTube Data API resource through the response cache.
+
+    Responses younger than freshness_seconds are served without any request.
+    Older ones are revalidated with If-None-Match, and a 304 only refreshes the
+    timestamp of the cached body. Entries live in memory and in MongoDB.
+    """
+    key = path + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+    now = datetime.utcnow()
+
+    entry = _response_cache.get(key)
+    if entry is None:
+        try:
+            entry = await get_db()[RESPONSE_CACHE_COLLECTION].find_one({"_id": key})
+        except Exception as e:
+            print(f"Response cache lookup failed: {str(e)}")
+            entry = None
+
+    if entry and now - entry["fetched_at"] < timedelta(seconds=freshness_seconds):
+        _response_cache.set(key, entry)
+        return entry["body"]
+
+    headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") else {}
+    resp = await api_get(path, params, headers=headers)
+
+    if resp.status_code == 304 and entry:
+        entry = {**entry, "fetched_at": now}
+        update = {"$set": {"fetched_at": now}}
+    else:
+        resp.raise_for_status()
+        body = resp.json()
+        entry = {"_id": key, "etag": body.get("etag") or resp.headers.get("ETag"), "body": body, "fetched_at": now}
+        update = {"$set": {"etag": entry["etag"], "body": body, "fetched_at": now}}
+
+    _response_cache.set(key, entry)
+    try:
+        await get_db()[RESPONSE_CACHE_COLLECTION].update_one({"_id": key}, update, upsert=True)
+    except Exception as e:
+        print(f"Response cache write failed: {str(e)}")
+
+    return entry["body"]
+
+
+def _build_video(
+    item: Dict[str, Any],
+    stats_map: Dict[str, Dict[str, Any]],
+    description_chars: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Build a video record from a playlist item and its statistics."""
+    vid = item["contentDetails"]["videoId"]
+    snippet = item["snippet"]
+    description = snippet.get("description")
+    if description and description_chars is not None:
+        description = description[:description_chars]
+
+    return {
+        "video_id": vid,
+        "title": snippet.get("title"),
+        "description": description,
+        "published_at": snippet.get("publishedAt"),
+        "url": f"https://www.youtube.com/watch?v={vid}",
+        "statistics": stats_map.get(vid, {}),
     }
 
-    # Combine results
-    videos = []
-    for item in items:
-        vid = item["contentDetails"]["videoId"]
-        snippet = item["snippet"]
-
-        videos.append({
-            "video_id": vid,
-            "title": snippet.get("title"),
-            "description": snippet.get("description"),
-            "published_at": snippet.get("publishedAt"),
-            "url": f"https://www.youtube.com/watch?v={vid}",
-            "statistics": stats_map.get(vid, {}),
-        })
-
-    return videos
+
+async def _fetch_playlist_page(playlist_id: str, page_token: Optional[str], page_size: int = MAX_IDS_PER_REQUEST) -> Dict[str, Any]:
+    """One page of a playlist, served from the response cache or revalidated with its ETag."""
+    params = {
+        "part": "snippet,contentDetails",
+        "playlistId": playlist_id,
+        "maxResults": page_size,
+    }
+    if page_token:
+        params["pageToken"] = page_token
+
+    return await conditional_get("/playlistItems", params, settings.playlist_freshness_seconds)
+
+
+async def stream_channel_videos(
+    channel_id: str,
+    max_videos: Optional[int] = None,
+    description_chars: Optional[int] = 500,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a channel's uploads, newest first, following nextPageToken through the
+    whole uploads playlist (or until max_videos).
+
+    The next playlist page is downloaded while statistics for the current page
+    (50 IDs, one /videos call) are fetched, and records are yielded as soon as
+    each page is complete, so memory stays bounded to about two pages.
+    Descriptions are truncated to description_chars to keep records compact
+    (None keeps them whole).
+    """
+    def page_size(yielded: int) -> int:
+        return MAX_IDS_PER_REQUEST if max_videos is None else min(MAX_IDS_PER_REQUEST, max_videos - yielded)
+
+    uploads_playlist = await get_uploads_playlist(channel_id)
+    next_page: Optional[asyncio.Task] = asyncio.create_task(_fetch_playlist_page(uploads_playlist, None, page_size(0)))
+    yielded = 0
+
+    try:
+        while next_page is not None:
+            page = await next_page
+            next_page = None
+
+            items = page.get("items", [])
+            if max_videos is not None:
+                items = items[:max_videos - yielded]
+
+            token = page.get("nextPageToken")
+            if token and (max_videos is None or yielded + len(items) < max_videos):
+                next_page = asyncio.create_task(
+                    _fetch_playlist_page(uploads_playlist, token, page_size(yielded + len(items)))
+                )
+
+            if not items:
+                continue
+
+            stats_map = await fetch_video_statistics(
+                [item["contentDetails"]["videoId"] for item in items]
+            )
+            for item in items:
+                yield _build_video(item, stats_map, description_chars)
+                yielded += 1
+    finally:
+        if next_page is not None and not next_page.done():
+            next_page.cancel()
+
+
+class StatisticsBatcher:
+    """
+    Coalesces /videos?part=statistics lookups from concurrent jobs.
+
+    Callers register the IDs they need and await their own futures. Pending IDs
+    are flushed after a short delay, or as soon as a full batch of 50 is waiting,
+    so N concurrent jobs share a handful of requests instead of one each.
+    """
+
+    def __init__(self, max_batch: int = MAX_IDS_PER_REQUEST, delay: float = 0.02):
+        self.max_batch = max_batch
+        self.delay = delay
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def get(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {video_id: statistics} for the requested IDs (missing videos are omitted)."""
+        loop = asyncio.get_running_loop()
+        futures: Dict[str, asyncio.Future] = {}
+        for vid in dict.fromkeys(video_ids):
+            future = loop.create_future()
+            self._pending.setdefault(vid, []).append(future)
+            futures[vid] = future
+
+        if len(self._pending) >= self.max_batch:
+            self._flush(full_batches_only=True)
+        if self._timer is None and self._pending:
+            self._timer = loop.call_later(self.delay, self._flush)
+
+        results = await asyncio.gather(*futures.values())
+        return {vid: stats for vid, stats in zip(futures, results) if stats is not None}
+
+    def _flush(self, full_batches_only: bool = False):
+        """Send pending IDs; when full_batches_only, a partial tail keeps waiting for the timer."""
+        ids = list(self._pending)
+        if full_batches_only:
+            ids = ids[:len(ids) - len(ids) % self.max_batch]
+        else:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+
+        for i in range(0, len(ids), self.max_batch):
+            chunk = {vid: self._pending.pop(vid) for vid in ids[i:i + self.max_batch]}
+            task = asyncio.create_task(self._fetch(chunk))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _fetch(self, chunk: Dict[str, List[asyncio.Future]]):
+        try:
+            resp = await api_get(
+                "/videos",
+                params={
+                    "part": "statistics",
+                    "id": ",".join(chunk),
+                },
+            )
+            resp.raise_for_status()
+            stats_map = {
+                v["id"]: v["statistics"]
+                for v in resp.json().get("items", [])
+            }
+        except Exception as e:
+            for futures in chunk.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for vid, futures in chunk.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(stats_map.get(vid))
+
+
+# Shared statistics batcher used by all jobs in this process
+statistics_batcher = StatisticsBatcher()
+
+
+async def fetch_video_statistics(video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns {video_id: statistics}, serving fresh entries from the per-video cache
+    and fetching the rest through the shared batcher.
+    """
+    stats_map: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for vid in video_ids:
+        stats = _statistics_cache.get(vid)
+        if stats is None:
+            missing.append(vid)
+        else:
+            stats_map[vid] = stats
+
+    if missing:
+        fetched = await statistics_batcher.get(missing)
+        for vid, stats in fetched.items():
+            _statistics_cache.set(vid, stats)
+        stats_map.update(fetched)
+
+    return stats_map
 
 
 async def close_http_client():
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -5,10 +7,8 @@ from jose import JWTError, jwt
 import bcrypt
 from typing import Optional
 from bson import ObjectId
-from bson.errors import InvalidId
 from app.core.config import settings
 import app.services.mongo_client as mongodb
-from app.models.models import USER_COLLECTION
 from fastapi import Request
 
 security = HTTPBearer()
@@ -48,9 +48,9 @@ def verify_jwt(token: str) -> dict:
         )
 
 
-async def get_current_user(request: Request):
+def get_request_token(request: Request) -> Optional[str]:
     """
-    FastAPI dependency to get the current user from cookie or Authorization header.
+    JWT sent with the request, if any.
     Checks cookies first, then falls back to Authorization header.
     """
     token = request.cookies.get("access_token")
@@ -58,6 +58,14 @@ async def get_current_user(request: Request):
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             token = auth_header.split(" ")[1]
+    return token
+
+
+async def get_current_user(request: Request):
+    """
+    FastAPI dependency to get the current user from cookie or Authorization header.
+    """
+    token = get_request_token(request)
 
     if not token:
         raise HTTPException(
@@ -74,16 +82,19 @@ async def get_current_user(request: Request):
             detail="Invalid token: missing subject",
         )
 
-    try:
-        user = await mongodb.get_db()[USER_COLLECTION].find_one(
-            {"_id": ObjectId(user_id_str)}
-        )
-    except InvalidId:
+    if not ObjectId.is_valid(user_id_str):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user ID format",
         )
 
+    if settings.auth_trust_jwt_claims:
+        # Identity from the signed token only; handlers load the profile when they need it
+        return {"_id": user_id_str, "email": payload.get("email")}
+
+    # Served from the user cache on repeat requests
+    user = await mongodb.get_user_by_id(user_id_str)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -93,6 +104,31 @@ async def get_current_user(request: Request):
     return user
 
 
+async def get_current_user_profile(user: dict = Depends(get_current_user)):
+    """
+    Like get_current_user, but always the full user document, also when
+    AUTH_TRUST_JWT_CLAIMS only provides the identity from the token.
+    """
+    if settings.auth_trust_jwt_claims:
+        user = await mongodb.get_user_by_id(user["_id"])
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+    return user
+
+
+async def get_optional_user(request: Request) -> Optional[dict]:
+    """
+    Like get_current_user for routes that guests may also use: None without a token.
+    A token that is sent but invalid is still rejected with 401.
+    """
+    if not get_request_token(request):
+        return None
+    return await get_current_user(request)
+
+
 # ==================== LOGIN HELPERS ======================
 
 def set_auth_cookie(response: Response, token: str, max_age: int = 604800):
@@ -118,10 +154,17 @@ def set_auth_cookie(response: Response, token: str, max_age: int = 604800):
 
 # ==================== PASSWORD HELPERS ====================
 
+# bcrypt releases the GIL while hashing, so a thread pool runs hashes in parallel
+# without the pickling and process start-up cost of a process pool
+_password_executor: Optional[ThreadPoolExecutor] = None
+# Hashes running or waiting in the executor
+_password_jobs = 0
+
+
 def hash_password(password: str) -> str:
     """Hash password with bcrypt, truncating to 72 bytes."""
     password_bytes = password.encode("utf-8")[:72]
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode("utf-8")
 
@@ -130,3 +173,53 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against bcrypt hash, truncating to 72 bytes."""
     password_bytes = plain_password.encode("utf-8")[:72]
     return bcrypt.checkpw(password_bytes, hashed_password.encode("utf-8"))
+
+
+def get_password_executor() -> ThreadPoolExecutor:
+    """Returns the shared executor for password hashing."""
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            thread_name_prefix="bcrypt",
+        )
+    return _password_executor
+
+
+async def _run_password_job(func, *args):
+    """
+    Run a bcrypt call on the password executor, keeping the event loop free.
+    Rejects the request with 503 once password_hash_workers hashes are running
+    and password_hash_queue_size more are waiting.
+    """
+    global _password_jobs
+    if _password_jobs >= settings.password_hash_workers + settings.password_hash_queue_size:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(), func, *args)
+    finally:
+        _password_jobs -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password() on the password executor."""
+    return await _run_password_job(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() on the password executor."""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+def close_password_executor():
+    """Shuts down the password executor."""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False)
+        _password_executor = None
@@ -0,0 +1,80 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from PIL import Image, ImageOps
+from app.core.config import settings
+
+# Avatars are stored as AVATAR_SIZE x AVATAR_SIZE WebP images
+AVATAR_SIZE = 400
+AVATAR_CONTENT_TYPE = "image/webp"
+
+# Pillow releases the GIL while decoding, resizing and encoding
+_image_executor: Optional[ThreadPoolExecutor] = None
+
+
+class InvalidImageError(ValueError):
+    """Raised for uploads that are not a decodable image or exceed the pixel limit."""
+
+
+def prepare_avatar(data: bytes, max_pixels: int, quality: int) -> bytes:
+    """
+    Decode an uploaded image, center-crop it to a square, resize it to
+    AVATAR_SIZE x AVATAR_SIZE and re-encode it as WebP.
+
+    The pixel count is read from the header and checked before anything is decoded,
+    so oversized images (decompression bombs) are rejected cheaply.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise InvalidImageError("Image is too large")
+    except Exception:
+        raise InvalidImageError("File is not a supported image")
+
+    width, height = image.size
+    if width * height > max_pixels:
+        raise InvalidImageError(f"Image is too large ({width}x{height} pixels)")
+
+    try:
+        # JPEG can decode directly at a reduced scale, much faster for large photos
+        image.draft("RGB", (AVATAR_SIZE, AVATAR_SIZE))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image = ImageOps.fit(image, (AVATAR_SIZE, AVATAR_SIZE), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=quality, method=4)
+    except Exception as e:
+        raise InvalidImageError(f"Could not process image: {str(e)}")
+    return output.getvalue()
+
+
+def get_image_executor() -> ThreadPoolExecutor:
+    """Returns the shared executor for image processing."""
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ThreadPoolExecutor(
+            max_workers=settings.image_processing_workers,
+            thread_name_prefix="images",
+        )
+    return _image_executor
+
+
+async def prepare_avatar_async(data: bytes) -> bytes:
+    """prepare_avatar() on the image executor, with the configured limits."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_image_executor(),
+        prepare_avatar,
+        data,
+        settings.avatar_max_pixels,
+        settings.avatar_webp_quality,
+    )
+
+
+def close_image_executor():
+    """Shuts down the image executor."""
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=False)
+        _image_executor = None
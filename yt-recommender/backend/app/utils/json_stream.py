@@ -0,0 +1,94 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ServiceStreamParser:
+    """
+    Incremental parser for the Gemini report JSON ({"services": {"<name>": {...}, ...}}).
+
+    Text is fed as it streams in; every time the object of one service under the
+    top-level "services" key is closed, that object is decoded and returned, long
+    before the rest of the document has arrived. Anything outside the root object
+    (such as markdown code fences) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_string: Optional[str] = None
+        self._keys: Dict[int, Optional[str]] = {}
+        self._services_depth: Optional[int] = None
+        self._service_name: Optional[str] = None
+        self._service_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consume a chunk of text and return the (service_name, object) pairs it completed."""
+        self._text += chunk
+        text = self._text
+        completed: List[Tuple[str, Dict[str, Any]]] = []
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i + 1]
+                continue
+
+            if self._depth == 0 and ch != "{":
+                continue  # Outside the root object, e.g. ```json fences
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                try:
+                    self._keys[self._depth] = json.loads(self._last_string) if self._last_string else None
+                except json.JSONDecodeError:
+                    self._keys[self._depth] = None
+            elif ch == ",":
+                self._keys[self._depth] = None
+            elif ch in "{[":
+                parent_key = self._keys.get(self._depth)
+                self._depth += 1
+                self._keys[self._depth] = None
+                if ch == "{" and self._depth == 2 and parent_key == "services":
+                    self._services_depth = self._depth
+                elif ch == "{" and self._services_depth is not None and self._depth == self._services_depth + 1:
+                    self._service_name = parent_key
+                    self._service_start = i
+            elif ch in "}]":
+                self._depth -= 1
+                if (
+                    ch == "}"
+                    and self._service_start is not None
+                    and self._services_depth is not None
+                    and self._depth == self._services_depth
+                ):
+                    try:
+                        obj = json.loads(text[self._service_start:i + 1])
+                    except json.JSONDecodeError:
+                        obj = None
+                    if isinstance(obj, dict) and self._service_name:
+                        completed.append((self._service_name, obj))
+                    self._service_name = None
+                    self._service_start = None
+                elif self._services_depth is not None and self._depth < self._services_depth:
+                    self._services_depth = None
+
+        self._pos = len(text)
+        return completed
@@ -0,0 +1,40 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Set
+
+
+class PubSub:
+    """
+    Minimal in-process publish/subscribe hub keyed by topic.
+
+    Every subscriber gets its own bounded queue; a subscriber that falls behind
+    loses its oldest messages rather than slowing down publishers.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def publish(self, topic: str, message: Any):
+        """Deliver a message to every current subscriber of the topic (never blocks)."""
+        for queue in self._subscribers.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    @contextmanager
+    def subscribe(self, topic: str) -> Iterator[asyncio.Queue]:
+        """Receive messages published to the topic while the context is open."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
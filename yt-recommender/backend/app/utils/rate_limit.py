@@ -0,0 +1,175 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Hashable, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from app.core.config import settings
+from app.models.models import RATE_LIMIT_COLLECTION
+from app.services.mongo_client import get_db
+from app.utils.cache import TTLCache
+
+
+class CostOverLimitError(Exception):
+    """A single request costs more than its plan allows per window, so waiting never helps."""
+
+    def __init__(self, plan: str, limit: int, window_seconds: float):
+        super().__init__(f"The {plan} plan allows at most {limit} per {window_seconds:g} seconds")
+        self.plan = plan
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+
+class SlidingWindowRateLimiter:
+    """
+    Per-key sliding window limiter: at most limits[plan] units in any window_seconds.
+
+    Each key keeps the timestamps of its recent units in memory, so a key over its
+    limit is rejected without any I/O. The plan of a key is remembered from its last
+    allowed hit, letting callers reject known keys before looking the plan up.
+    State is per process; SharedRateLimiter adds the limit across API replicas.
+    """
+
+    def __init__(self, limits: Dict[str, int], window_seconds: float = 60.0, max_keys: int = 100000):
+        self.limits = limits
+        self.window_seconds = window_seconds
+        self._hits = TTLCache(maxsize=max_keys, ttl=window_seconds)
+        self._plans = TTLCache(maxsize=max_keys, ttl=window_seconds)
+
+    def _limit(self, plan: str) -> int:
+        return self.limits.get(plan, self.limits["free"])
+
+    def _window(self, key: Hashable) -> Deque[float]:
+        """Timestamps of the key's units still inside the window."""
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = deque()
+        cutoff = time.monotonic() - self.window_seconds
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+        return hits
+
+    def retry_after(self, key: Hashable, plan: Optional[str] = None, cost: int = 1) -> float:
+        """
+        Seconds until cost more units fit for the key (0 when they fit now).
+        Without a plan the key's last known plan is used; unknown keys are allowed.
+        Raises CostOverLimitError when cost is above the plan's limit.
+        """
+        plan = plan or self._plans.get(key)
+        if plan is None:
+            return 0.0
+        hits = self._window(key)
+        limit = self._limit(plan)
+        if cost > limit:
+            raise CostOverLimitError(plan, limit, self.window_seconds)
+        excess = len(hits) + cost - limit
+        if excess <= 0:
+            return 0.0
+        return max(hits[excess - 1] + self.window_seconds - time.monotonic(), 0.0)
+
+    def hit(self, key: Hashable, plan: str, cost: int = 1) -> float:
+        """
+        Record cost units for the key if they fit.
+        Returns 0 when recorded, otherwise the seconds to wait (nothing is recorded).
+        Raises CostOverLimitError when cost is above the plan's limit.
+        """
+        wait = self.retry_after(key, plan, cost)
+        if wait:
+            return wait
+        hits = self._window(key)
+        now = time.monotonic()
+        hits.extend([now] * cost)
+        self._hits.set(key, hits)
+        self._plans.set(key, plan)
+        return 0.0
+
+    def release(self, key: Hashable, cost: int = 1):
+        """Forget the last cost units recorded for the key (a hit that was undone)."""
+        hits = self._window(key)
+        for _ in range(min(cost, len(hits))):
+            hits.pop()
+        self._hits.set(key, hits)
+
+
+class SharedRateLimiter:
+    """
+    The limits of a SlidingWindowRateLimiter enforced across every API process.
+
+    The in-memory limiter stays in front as a cheap early reject: a process never
+    allows more than the shared limit on its own. Allowed hits are then counted in
+    MongoDB, one document per key and fixed window, with an atomic $inc; the sliding
+    window is approximated by weighting the previous window by its remaining overlap.
+    Window documents expire through a TTL index. When MongoDB is unreachable only
+    the per-process limit applies.
+    """
+
+    def __init__(self, local: SlidingWindowRateLimiter, collection_name: str = RATE_LIMIT_COLLECTION):
+        self.local = local
+        self.collection_name = collection_name
+
+    def retry_after(self, key: str, plan: Optional[str] = None, cost: int = 1) -> float:
+        """SlidingWindowRateLimiter.retry_after() of this process, without any I/O."""
+        return self.local.retry_after(key, plan, cost)
+
+    async def hit(self, key: str, plan: str, cost: int = 1) -> float:
+        """
+        Record cost units for the key if they fit, both in this process and shared.
+        Returns 0 when recorded, otherwise the seconds to wait (nothing is recorded).
+        Raises CostOverLimitError when cost is above the plan's limit.
+        """
+        wait = self.local.hit(key, plan, cost)
+        if wait:
+            return wait
+        try:
+            wait = await self._hit_shared(key, self.local._limit(plan), cost)
+        except PyMongoError as e:
+            print(f"Shared rate limit unavailable, limiting per process: {str(e)}")
+            return 0.0
+        if wait:
+            self.local.release(key, cost)
+        return wait
+
+    async def _hit_shared(self, key: str, limit: int, cost: int) -> float:
+        window_seconds = self.local.window_seconds
+        now = time.time()
+        window = int(now // window_seconds)
+        elapsed = now - window * window_seconds
+        collection = get_db()[self.collection_name]
+        current, previous = await asyncio.gather(
+            collection.find_one_and_update(
+                {"_id": f"{key}|{window}"},
+                {
+                    "$inc": {"count": cost},
+                    # Kept through the next window, which weighs it in
+                    "$setOnInsert": {"expires_at": datetime.utcfromtimestamp((window + 2) * window_seconds)},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            ),
+            collection.find_one({"_id": f"{key}|{window - 1}"}, {"count": 1}),
+        )
+        previous_count = previous["count"] if previous else 0
+        if previous_count * (1 - elapsed / window_seconds) + current["count"] <= limit:
+            return 0.0
+
+        await collection.update_one({"_id": current["_id"]}, {"$inc": {"count": -cost}})
+        # Units the previous window may still weigh for cost to fit
+        room = limit - current["count"]
+        if room < 0 or not previous_count:
+            # Only fits once this window has become the previous one
+            return max(window_seconds - elapsed, 1.0)
+        # Until the previous window's share has decayed enough
+        return max(window_seconds * (1 - room / previous_count) - elapsed, 1.0)
+
+
+# Jobs submitted per user (per client IP for guests), shared by /submit and /submit/batch
+submit_rate_limiter = SharedRateLimiter(SlidingWindowRateLimiter(
+    limits={
+        "guest": settings.submit_rate_limit_guest,
+        "free": settings.submit_rate_limit_free,
+        "pro": settings.submit_rate_limit_pro,
+        "team": settings.submit_rate_limit_team,
+    },
+    window_seconds=settings.submit_rate_limit_window_seconds,
+))
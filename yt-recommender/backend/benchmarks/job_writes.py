@@ -0,0 +1,160 @@
+"""
+MongoDB round trips per job: one update per step vs. the job state accumulator.
+
+Runs N concurrent jobs through the worker pipeline, with the YouTube and Gemini calls
+replaced by short sleeps, and counts the commands sent to the jobs collection with
+pymongo command monitoring. Needs a MongoDB server (MONGODB_URI); the jobs are
+written to the BENCHMARK_DATABASE scratch database, whatever DATABASE_NAME says,
+and that database is dropped afterwards.
+
+    python -m benchmarks.job_writes --jobs 20 --services 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime
+
+os.environ.setdefault("YOUTUBE_API_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from pymongo import monitoring
+from app.core.config import settings
+from app.core import worker
+from app.services import mongo_client
+from app.services.mongo_client import get_job, update_job
+
+# The only database this benchmark writes to (and drops)
+BENCHMARK_DATABASE = "benchmark_job_writes"
+
+
+def _scratch_db():
+    """The benchmark database; refuses to touch any other one."""
+    if settings.database_name != BENCHMARK_DATABASE:
+        raise SystemExit(f"Refusing to run against database {settings.database_name!r}")
+    return mongo_client.get_db()
+
+
+class _JobCommands(monitoring.CommandListener):
+    """Counts the commands sent to the jobs collection, by command name."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def started(self, event):
+        if event.command.get(event.command_name) == "jobs":
+            self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def _resolve_channel(channel_name: str) -> str:
+    await asyncio.sleep(random.uniform(0.01, 0.05))
+    return f"UC{channel_name}"
+
+
+async def _fetch_latest_videos(channel_id: str) -> list:
+    await asyncio.sleep(random.uniform(0.05, 0.2))
+    return [{"video_id": f"{channel_id}-{i}", "title": f"Video {i}"} for i in range(10)]
+
+
+async def _stream_channel_videos(channel_id: str, max_videos=None, description_chars=None):
+    for video in await _fetch_latest_videos(channel_id):
+        yield video
+
+
+def _fake_analyse():
+    async def analyse(videos, services=None, on_service_result=None):
+        report = {"services": {}}
+        for name in services:
+            await asyncio.sleep(random.uniform(0.1, 0.3))
+            result = {"summary": f"{name} for {len(videos)} videos"}
+            report["services"][name] = result
+            if on_service_result:
+                await on_service_result(name, result)
+        return report
+    return analyse
+
+
+async def _previous_process_job(job_id: str, job=None):
+    """Previous behaviour: re-read the job, then one update_job() per step and per service."""
+    job = await get_job(job_id)
+    services = job.get("services", [])
+    channel_id = await worker.resolve_channel(job["channel_name"])
+    await update_job(job_id, {"channel_id": channel_id, "status": "channel_resolved", "updated_at": datetime.utcnow()})
+    videos = await _fetch_latest_videos(channel_id)
+    await update_job(job_id, {"videos": videos, "status": "videos_fetched", "ai_report": {"services": {}}})
+
+    async def publish_service_result(service_name, result):
+        await update_job(job_id, {f"ai_report.services.{service_name}": result})
+
+    report = await worker.analyse(videos, services=services, on_service_result=publish_service_result)
+    await update_job(job_id, {"ai_report": report, "status": "completed"})
+
+
+async def _run(jobs: int, services: int, process_job, listener: _JobCommands) -> dict:
+    db = _scratch_db()
+    await db.jobs.delete_many({})
+    names = [f"service_{i}" for i in range(services)]
+    claimed = []
+    for i in range(jobs):
+        document = {"channel_name": f"channel{i}", "services": names, "status": "queued", "created_at": datetime.utcnow()}
+        result = await db.jobs.insert_one(document)
+        claimed.append({**document, "_id": str(result.inserted_id)})
+
+    # Both variants get the claimed document from the worker, as in JobWorkerPool
+    listener.counts.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(process_job(job["_id"], job) for job in claimed))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(settings.job_write_batch_delay * 2)
+
+    counts = dict(listener.counts)  # Before the check below adds its own command
+    completed = await db.jobs.count_documents({"status": "completed"})
+    commands = sum(counts.values())
+    return {
+        "elapsed": elapsed,
+        "completed": completed,
+        "commands": counts,
+        "per_job": commands / jobs,
+    }
+
+
+async def main(jobs: int, services: int):
+    # Set here rather than through DATABASE_NAME, which may point at real data
+    settings.database_name = BENCHMARK_DATABASE
+    listener = _JobCommands()
+    monitoring.register(listener)
+    settings.singleflight_enabled = False  # Every job does its own work
+    worker.resolve_channel = _resolve_channel
+    worker.stream_channel_videos = _stream_channel_videos
+    worker.analyse = _fake_analyse()
+
+    print(f"{jobs} concurrent jobs, {services} services each, "
+          f"write batch delay {settings.job_write_batch_delay * 1000:.0f} ms")
+    try:
+        for label, process_job in (
+            ("update per step", _previous_process_job),
+            ("job state accumulator", worker.process_job),
+        ):
+            result = await _run(jobs, services, process_job, listener)
+            print(f"  {label:24s} {result['per_job']:5.2f} round trips/job  "
+                  f"{result['commands']}  completed={result['completed']}/{jobs}  "
+                  f"{result['elapsed']:.2f}s")
+    finally:
+        await mongo_client.get_client().drop_database(_scratch_db().name)
+        await mongo_client.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--services", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.services))
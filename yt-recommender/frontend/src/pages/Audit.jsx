@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import { submitAudit, getJobStatus } from '../services/api';
+import { submitAudit, getJobStatus, getJobProgress } from '../services/api';
 import { useReports } from '../context/ReportsContext';
 import { useNavigate } from 'react-router-dom';
 import {
@@ -119,9 +119,11 @@ const Audit = () => {
 
     const poll = async () => {
       try {
-        const result = await getJobStatus(jobId);
+        const progress = await getJobProgress(jobId);
 
-        if (result.status === 'completed') {
+        if (progress.status === 'completed') {
+          // Load the videos and report only once they are ready
+          const result = await getJobStatus(jobId);
           addReport({
             id: result.jobId,
             jobId: result.jobId,
@@ -137,8 +139,8 @@ const Audit = () => {
 
           setStep('complete');
           return;
-        } else if (result.status === 'failed') {
-          setError(result.error || 'Job processing failed');
+        } else if (progress.status === 'failed') {
+          setError(progress.error || 'Job processing failed');
           setStep('error');
           return;
         }
@@ -193,11 +195,34 @@ const Audit = () => {
       setCurrentJobId(result.jobId);
       pollJobStatus(result.jobId);
     } catch (error) {
-      setError(error.response?.data?.detail || "Failed to submit request. Please try again.");
+      setError(getSubmitErrorMessage(error));
       setStep('error');
     }
   };
 
+  const getSubmitErrorMessage = (error) => {
+    const status = error.response?.status;
+    const detail = error.response?.data?.detail;
+    switch (status) {
+      case 401:
+        return "Your session has expired. Please sign in again.";
+      case 402:
+        return detail || "You are out of credits. Upgrade your plan to run more audits.";
+      case 403:
+        return detail || "This request exceeds what your plan allows.";
+      case 404:
+        return "Your account could not be found. Please sign in again.";
+      case 429: {
+        const retryAfter = error.response.headers?.['retry-after'];
+        return retryAfter
+          ? `Too many audits submitted. Please try again in ${retryAfter} seconds.`
+          : "Too many audits submitted. Please try again shortly.";
+      }
+      default:
+        return detail || "Failed to submit request. Please try again.";
+    }
+  };
+
   const handleRetry = () => {
     setError(null);
     setStep('input');
@@ -62,8 +62,9 @@ export const authApi = {
 };
 
 // Job API (existing)
+// Sent with the auth token when signed in, so the job is charged to the account
 export const submitAudit = async (data) => {
-  const response = await axios.post(`${API_BASE_URL}/submit`, data);
+  const response = await api.post('/submit', data);
   return response.data;
 };
 
@@ -72,4 +73,10 @@ export const getJobStatus = async (jobId) => {
   return response.data;
 };
 
+// Status and error only; cheap enough to poll
+export const getJobProgress = async (jobId) => {
+  const response = await axios.get(`${API_BASE_URL}/job/${jobId}/status`);
+  return response.data;
+};
+
 export default api;